@@ -1,11 +1,45 @@
+import time
 import streamlit as st
-from model import predict_yield
-from crop_info import crop_details, state_based_crops, state_season_crop_map, crop_yield_ranges
+import altair as alt
+import numpy as np
+import pandas as pd
+from model import MODEL_FILE, TrainedYieldModel, YieldSurface
+import risk
+from weather_store import shared_store
+from crop_info import catalog
+from chatbot import ChatHistory, ResponseCache
+from chat_backend import ChatBackend, make_responder
+from images import DISPLAY_WIDTH, ThumbnailCache, build_manifest
+from metrics import METRICS_FILE, app_metrics as metrics
+from session_store import SessionStore, make_backend
 import os
+import re
+import uuid
+
+rerun_start = time.perf_counter()
+
+# Slider domains, shared by the widgets and the precomputed yield surface
+TEMPERATURE_RANGE = (10, 45)
+RAINFALL_RANGE = (0, 300)
+
+# Chat messages kept per session and shown per page
+CHAT_HISTORY_LIMIT = int(os.environ.get("CROP_BOT_CHAT_HISTORY_LIMIT", 200))
+CHAT_PAGE_SIZE = 10
+
+# Seasons drawn per crop for the yield risk panel
+RISK_SCENARIOS = 20_000
+
+YIELD_LEVEL_LABELS = {
+    "good": "\U0001F7E2 Good Yield",
+    "average": "\U0001F7E1 Average Yield",
+    "poor": "\U0001F534 Poor Yield",
+}
 
 # Set page config first
 st.set_page_config(page_title="\U0001F33E AI Crop Yield Chatbot", page_icon="\U0001F33E", layout="wide")
 
+css_start = time.perf_counter()
+
 # Apply custom CSS for layout
 st.markdown("""
     <style>
@@ -34,94 +68,348 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+
+# Built once per server process and shared by every session
+@st.cache_resource
+def load_trained_model():
+    # Regression model from train_model.py; without one the coefficient registry is used
+    if not os.path.exists(MODEL_FILE):
+        return None
+    return TrainedYieldModel.load(MODEL_FILE)
+
+
+@st.cache_resource
+def load_yield_surface():
+    return YieldSurface(catalog.crops, TEMPERATURE_RANGE, RAINFALL_RANGE, model=load_trained_model())
+
+
+@st.cache_resource
+def load_climates():
+    return risk.load_climates()
+
+
+# Keyed on the surface version as well, so new coefficients give new results
+@st.cache_data(max_entries=256)
+def yield_risk(crop, state, season, model_version):
+    return risk.simulate(crop, state, season, RISK_SCENARIOS, seed=0, climates=load_climates(),
+                         yield_model=load_trained_model())
+
+
+@st.cache_resource
+def open_weather_store():
+    # Daily weather ingested with weather_store.py, the process's shared
+    # read-only store. Days ingested while the app runs show up on the next
+    # lookup.
+    return shared_store()
+
+
+def load_weather_store():
+    # None until a store exists. cache_resource does not keep the
+    # FileNotFoundError, so a store created later is picked up on a later run.
+    try:
+        return open_weather_store()
+    except FileNotFoundError:
+        return None
+
+
+@st.cache_resource
+def load_response_cache():
+    return ResponseCache(maxsize=4096)
+
+
+@st.cache_resource
+def load_chat_backend():
+    cache = load_response_cache()
+    return ChatBackend(make_responder(cache=cache), cache=cache)
+
+
+@st.cache_resource
+def load_crop_images():
+    return ThumbnailCache(build_manifest())
+
+
+@st.cache_resource
+def load_session_store():
+    return SessionStore(make_backend(), max_messages=CHAT_HISTORY_LIMIT)
+
+
+yield_surface = load_yield_surface()
+response_cache = load_response_cache()
+chat_backend = load_chat_backend()
+crop_images = load_crop_images()
+session_store = load_session_store()
+weather_store = load_weather_store()
+
+# ---------- SESSION ----------
+# The session id lives in the URL (?sid=...), so a returning user gets their
+# selections and chat back from the session store on any server process
+session_id = st.query_params.get("sid", "")
+if not re.fullmatch(r"[0-9a-f]{32}", session_id):
+    session_id = uuid.uuid4().hex
+    st.query_params["sid"] = session_id
+if st.session_state.get("session_id") != session_id:
+    saved = session_store.load(session_id) or {}
+    selections = saved.get("selections", {})
+    valid = {
+        "state": selections.get("state") in catalog.states,
+        "season": selections.get("season") in catalog.seasons,
+        "crop": selections.get("crop") in catalog.crops,
+        "temperature": TEMPERATURE_RANGE[0] <= selections.get("temperature", -1) <= TEMPERATURE_RANGE[1],
+        "rainfall": RAINFALL_RANGE[0] <= selections.get("rainfall", -1) <= RAINFALL_RANGE[1],
+    }
+    for key, ok in valid.items():
+        if ok:
+            st.session_state[key] = selections[key]
+    st.session_state.chat_history = ChatHistory(limit=CHAT_HISTORY_LIMIT, messages=saved.get("chat", ()))
+    st.session_state.last_chat_input = saved.get("last_chat_input")
+    st.session_state.session_id = session_id
+
 # ---------- TITLE SECTION ----------
 st.markdown('<div class="title-section"><h1>\U0001F33E AI Crop Yield Chatbot</h1><p>Empowering Indian Farmers With Smart Predictions</p></div>', unsafe_allow_html=True)
+metrics.observe("css_title", time.perf_counter() - css_start)
+
+# ---------- SHARED STATE ----------
+# The page is split into fragments that rerun on their own: moving a slider
+# reruns only the prediction fragment, sending a message only the chat one.
+# Everything they share goes through st.session_state (the widget keys,
+# chat_history and last_chat_input), so each fragment reads the latest values
+# without the rest of the script running, and saves the session itself.
+
+
+def save_session():
+    # Only queued here; the store's writer thread batches the actual writes
+    session_snapshot = {
+        "selections": {key: st.session_state[key] for key in ("state", "season", "crop", "temperature", "rainfall")},
+        "chat": st.session_state.chat_history.messages(),
+        "last_chat_input": st.session_state.last_chat_input,
+    }
+    if session_snapshot != st.session_state.get("saved_session"):
+        session_store.save(st.session_state.session_id, session_snapshot)
+        st.session_state.saved_session = session_snapshot
+
+
+def export_metrics():
+    cache_stats = response_cache.stats()
+    image_stats = crop_images.stats()
+    chat_stats = chat_backend.stats()
+    gauges = {
+        "response_cache_hits": cache_stats["hits"],
+        "response_cache_misses": cache_stats["misses"],
+        "response_cache_evictions": cache_stats["evictions"],
+        "response_cache_size": cache_stats["size"],
+        "image_cache_hits": image_stats["hits"],
+        "image_cache_misses": image_stats["misses"],
+        "image_cache_bytes": image_stats["size_bytes"],
+        "chat_active_replies": chat_stats["active"],
+        "chat_fallbacks": chat_stats["fallbacks"],
+        "chat_truncated": chat_stats["truncated"],
+        "chat_errors": chat_stats["errors"],
+    }
+    metrics.maybe_write(METRICS_FILE, gauges)
+    return gauges
+
 
 # ---------- MAIN SECTION ----------
 st.markdown('<div class="main-section">', unsafe_allow_html=True)
 
+# State and season feed both fragments, so changing them reruns the whole page
 st.subheader("\U0001F4CD Select Region & Season")
-state = st.selectbox("Select your state:", list(state_season_crop_map.keys()))
-season = st.selectbox("Select the season:", ["Kharif", "Rabi", "Zaid", "Cash Crops"])
+state = st.selectbox("Select your state:", catalog.states, key="state")
+season = st.selectbox("Select the season:", catalog.seasons, key="season")
 
-if state in state_season_crop_map and season in state_season_crop_map[state]:
-    crops_in_season = state_season_crop_map[state][season]
+with metrics.section("region_season"):
+    crops_in_season = catalog.crops_for(state, season)
     if crops_in_season:
         st.success(f"Crops grown in {state} during {season} season: {', '.join(crops_in_season)}")
     else:
         st.warning("No crops listed for this state and season.")
 
-st.subheader("\U0001F50D Predict Crop Yield")
-
-crop = st.selectbox("Select your crop:", list(crop_details.keys()))
-temperature = st.slider("\U0001F321️ Average temperature (°C):", 10, 45, 25)
-rainfall = st.slider("\U0001F327️ Expected rainfall (mm):", 0, 300, 100)
-
-# Show crop image
-image_extensions = ["jpg", "jpeg", "png"]
-image_found = False
-for ext in image_extensions:
-    image_path = f"crop_images/{crop.lower()}.{ext}"
-    if os.path.exists(image_path):
-        st.image(image_path, caption=f"{crop}", width=300)
-        image_found = True
-        break
-if not image_found:
-    st.info("Image not available for this crop.")
-
-if crop in crop_details:
-    st.markdown(f"**\U0001F4C5 Season of {crop}:** {crop_details[crop]['season']}")
-    st.markdown(f"**\U0001F4CD Commonly grown in:** {crop_details[crop]['states']}")
-
-if st.button("\U0001F4CA Predict Yield"):
-    result = predict_yield(crop, temperature, rainfall)
-
-    if crop in crop_yield_ranges:
-        ranges = crop_yield_ranges[crop]
-        if result >= ranges["good"]:
-            level = "\U0001F7E2 Good Yield"
-        elif result >= ranges["average"]:
-            level = "\U0001F7E1 Average Yield"
+st.session_state.setdefault("temperature", 25)
+st.session_state.setdefault("rainfall", 100)
+
+
+@st.fragment
+def prediction_section():
+    fragment_start = time.perf_counter()
+    state, season = st.session_state.state, st.session_state.season
+    crops_in_season = catalog.crops_for(state, season)
+
+    st.subheader("\U0001F50D Predict Crop Yield")
+
+    crop = st.selectbox("Select your crop:", catalog.crops, key="crop")
+
+    # Recorded weather replaces the sliders when the store has the season; the
+    # sliders stay on the page (disabled) so their values are kept
+    weather = None
+    if weather_store is not None and st.toggle("\U0001F4E1 Use recorded weather", key="use_recorded_weather"):
+        with metrics.section("weather_store"):
+            weather = weather_store.state_features(state, season)
+        if weather is None:
+            st.info(f"No recorded weather for {state} during {season}, using the sliders.")
+    temperature = st.slider("\U0001F321️ Average temperature (°C):", *TEMPERATURE_RANGE, key="temperature",
+                            disabled=weather is not None)
+    rainfall = st.slider("\U0001F327️ Expected rainfall (mm):", *RAINFALL_RANGE, key="rainfall",
+                         disabled=weather is not None)
+    if weather is not None:
+        temperature, rainfall = weather["temperature"], weather["rainfall"]
+        st.caption(f"{season} {weather['year']} weather for {state}, {weather['days']} days to "
+                   f"{weather['last_date']:%d %b %Y}: mean {temperature} °C, {weather['rainfall_total']} mm of rain "
+                   f"({rainfall} mm a month), {weather['degree_days']:.0f} degree-days above "
+                   f"{weather_store.base_temperature:g} °C.")
+
+    # Show crop image
+    with metrics.section("image"):
+        thumbnail = crop_images.get(crop)
+        if thumbnail is not None:
+            st.image(thumbnail, caption=f"{crop}", width=DISPLAY_WIDTH)
         else:
-            level = "\U0001F534 Poor Yield"
-        st.success(f"\u2705 Estimated Yield for {crop}: **{result} tons/acre**")
-        st.info(f"\U0001F33E Yield Level: **{level}**")
+            st.info("Image not available for this crop.")
+
+    details = catalog.details(crop)
+    if details:
+        st.markdown(f"**\U0001F4C5 Season of {crop}:** {details['season']}")
+        st.markdown(f"**\U0001F4CD Commonly grown in:** {', '.join(catalog.states_for(crop))}")
+
+    if st.button("\U0001F4CA Predict Yield"):
+        with metrics.section("prediction"):
+            result = yield_surface.lookup(crop, temperature, rainfall)
+            metrics.inc("predictions")
+
+            level = catalog.yield_level(crop, result)
+            if level:
+                st.success(f"\u2705 Estimated Yield for {crop}: **{result} tons/acre**")
+                st.info(f"\U0001F33E Yield Level: **{YIELD_LEVEL_LABELS[level]}**")
+            else:
+                st.success(f"\u2705 Estimated Yield for {crop}: **{result} tons/acre**")
+                st.warning("\u26A0\uFE0F Yield category not available for this crop.")
+
+    with st.expander(f"\U0001F4CA Compare all crops in {state} during {season}"):
+        with metrics.section("comparison"):
+            if crops_in_season:
+                yields = yield_surface.predict_batch(crops_in_season, temperature, rainfall)
+                levels = catalog.yield_levels(crops_in_season, yields)
+                comparison = pd.DataFrame({
+                    "Crop": crops_in_season,
+                    "Yield (tons/acre)": yields,
+                    "Level": [YIELD_LEVEL_LABELS.get(level, "Not available") for level in levels],
+                }).sort_values("Yield (tons/acre)", ascending=False, ignore_index=True)
+                st.dataframe(comparison, hide_index=True)
+                st.altair_chart(
+                    alt.Chart(comparison).mark_bar().encode(
+                        x=alt.X("Yield (tons/acre):Q"),
+                        y=alt.Y("Crop:N", sort="-x"),
+                        color=alt.Color("Level:N"),
+                        tooltip=list(comparison.columns),
+                    ),
+                    width="stretch",
+                )
+            else:
+                st.info("No crops listed for this state and season.")
+
+    with st.expander(f"\U0001F5FA️ Yield map for {crop}"):
+        with metrics.section("yield_map"):
+            heatmap = alt.Chart(yield_surface.frame(crop, rainfall_step=10)).mark_rect().encode(
+                x=alt.X("rainfall:O", title="Rainfall (mm)"),
+                y=alt.Y("temperature:O", title="Temperature (°C)", sort="descending"),
+                color=alt.Color("yield:Q", title="tons/acre", scale=alt.Scale(scheme="yellowgreen")),
+                tooltip=["temperature", "rainfall", "yield"],
+            )
+            st.altair_chart(heatmap, width="stretch")
+
+    with st.expander(f"\U0001F3B2 Yield risk for {crop} in {state} during {season}"):
+        with metrics.section("risk"):
+            try:
+                summary = yield_risk(crop, state, season, yield_surface.version)
+            except KeyError:
+                summary = None
+                st.info("No climate data for this state and season.")
+            if summary is not None:
+                st.caption(f"{summary['scenarios']:,} seasons drawn from the {season} climate of {state}. "
+                           f"Median {summary['percentiles'][50]} tons/acre, "
+                           f"5-95% range {summary['percentiles'][5]} to {summary['percentiles'][95]}.")
+                if summary["bands"]:
+                    for column, level in zip(st.columns(len(risk.LEVELS)), risk.LEVELS):
+                        column.metric(YIELD_LEVEL_LABELS[level], f"{summary['bands'][level]:.0%}")
+                else:
+                    st.warning("\u26A0\uFE0F Yield category not available for this crop.")
+                edges, counts = summary["histogram"]["edges"], summary["histogram"]["counts"]
+                histogram = pd.DataFrame({"from": edges[:-1], "to": edges[1:], "share": np.array(counts) / summary["scenarios"]})
+                st.altair_chart(
+                    alt.Chart(histogram).mark_bar().encode(
+                        x=alt.X("from:Q", bin="binned", title="Yield (tons/acre)"),
+                        x2="to:Q",
+                        y=alt.Y("share:Q", title="Share of seasons", axis=alt.Axis(format="%")),
+                    ),
+                    width="stretch",
+                )
+
+    save_session()
+    export_metrics()
+    metrics.observe("prediction_fragment", time.perf_counter() - fragment_start)
+
+
+@st.fragment
+def chat_section():
+    fragment_start = time.perf_counter()
+    state, season = st.session_state.state, st.session_state.season
+    chat_history = st.session_state.chat_history
+
+    st.markdown("### \U0001F4AC Ask Anything About Agriculture")
+    user_input = st.text_input("\U0001F9D1 You:", placeholder="Ask me about crops, seasons, soil, etc...")
+
+    # The text box keeps its value across reruns, so only answer a new message once
+    pending_message = None
+    if user_input and user_input != st.session_state.get("last_chat_input"):
+        pending_message = user_input
     else:
-        st.success(f"\u2705 Estimated Yield for {crop}: **{result} tons/acre**")
-        st.warning("\u26A0\uFE0F Yield category not available for this crop.")
-
-# --- Chatbot Section ---
-st.markdown("### \U0001F4AC Ask Anything About Agriculture")
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
-
-user_input = st.text_input("\U0001F9D1 You:", placeholder="Ask me about crops, seasons, soil, etc...")
-
-if user_input:
-    def get_bot_response(user_msg):
-        user_msg = user_msg.lower()
-        if "best crop" in user_msg or "which crop" in user_msg:
-            return f"In {state}, during {season}, you can grow: {', '.join(state_season_crop_map[state][season])}"
-        elif "rainfall" in user_msg:
-            return "Most Kharif crops need good rainfall, around 100-200mm is ideal."
-        elif "temperature" in user_msg:
-            return "Rabi crops prefer cooler temperatures (10-25°C), while Kharif crops prefer warmer (25-35°C)."
-        elif "soil" in user_msg:
-            return "Black soil is good for cotton, alluvial for rice and wheat, loamy for vegetables."
-        else:
-            return "I'm still learning! Try asking about crops, seasons, soil, rainfall, or temperature."
+        st.session_state.last_chat_input = user_input
+
+    # Display chat history, one page (newest by default) in a single markdown call
+    with metrics.section("history"):
+        pages = chat_history.page_count(CHAT_PAGE_SIZE)
+        page = 0
+        if pages > 1:
+            page = st.number_input("Older messages (page):", min_value=0, max_value=pages - 1, value=0, step=1)
+        messages = chat_history.page(page, CHAT_PAGE_SIZE)
+        if messages:
+            st.markdown("  \n".join(f"{msg['role']}: {msg['content']}" for msg in messages))
 
-    bot_reply = get_bot_response(user_input)
-    st.session_state.chat_history.append({"role": "user", "content": user_input})
-    st.session_state.chat_history.append({"role": "bot", "content": bot_reply})
+    # The exchange is only added to the history when the reply is complete, so
+    # a rerun that interrupts it answers the message again
+    if pending_message:
+        with metrics.section("chatbot"):
+            st.markdown(f"user: {pending_message}")
+            reply_tokens = []
 
-# Display chat history
-for msg in st.session_state.chat_history:
-    st.markdown(f"{msg['role']}: {msg['content']}")
+            def stream_reply():
+                start = time.perf_counter()
+                yield "bot: "
+                for token in chat_backend.stream(pending_message, state, season):
+                    if not reply_tokens:
+                        metrics.observe("chat_first_token", time.perf_counter() - start)
+                    reply_tokens.append(token)
+                    yield token
+
+            st.write_stream(stream_reply())
+        chat_history.append("user", pending_message)
+        chat_history.append("bot", "".join(reply_tokens))
+        st.session_state.last_chat_input = pending_message
+        metrics.inc("chat_messages")
+
+    save_session()
+    export_metrics()
+    metrics.observe("chat_fragment", time.perf_counter() - fragment_start)
+
+
+prediction_section()
+# The chat is drawn into its place here but run after the footer, so a reply
+# being streamed never holds up the rest of the page
+chat_area = st.container()
 
 st.markdown('</div>', unsafe_allow_html=True)
 
 # ---------- FOOTER SECTION ----------
+footer_start = time.perf_counter()
 st.markdown('<div class="footer-section">', unsafe_allow_html=True)
 
 col1, col2 = st.columns([1, 2])
@@ -147,3 +435,28 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 st.markdown('</div>', unsafe_allow_html=True)
+metrics.observe("footer", time.perf_counter() - footer_start)
+
+with chat_area:
+    chat_section()
+
+# ---------- METRICS ----------
+metrics.inc("reruns")
+metrics.observe("rerun", time.perf_counter() - rerun_start)
+gauges = export_metrics()
+
+# Debug panel, shown with ?debug=1 in the URL or CROP_BOT_DEBUG=1
+if st.query_params.get("debug") == "1" or os.environ.get("CROP_BOT_DEBUG") == "1":
+    sections, counters = metrics.snapshot()
+    with st.sidebar:
+        st.markdown("### \U0001F6E0️ Rerun timings")
+        st.dataframe(
+            [
+                {"section": name, "runs": count, "avg ms": round(total / count * 1000, 2),
+                 "last ms": round(last * 1000, 2), "max ms": round(worst * 1000, 2)}
+                for name, (count, total, last, worst) in sections.items()
+            ],
+            hide_index=True,
+        )
+        st.markdown("### \U0001F522 Counters")
+        st.json({**counters, **gauges})
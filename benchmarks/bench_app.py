@@ -0,0 +1,83 @@
+# End-to-end rerun timings of app.py driven headlessly through AppTest
+# Run from the project root: python -m benchmarks.bench_app
+#
+# AppTest always reruns the whole script, which is what every interaction cost
+# before the page was split into fragments. A live server only reruns the
+# fragment holding the widget. Both are taken from the app's own timers, so
+# they compare like for like: <interaction>_rerun_ms is the whole script and
+# <interaction>_scoped_ms the part a server reruns. <interaction>_ms is the
+# AppTest wall-clock time, harness and serialisation included.
+import os
+import statistics
+import time
+
+# Keep benchmark sessions out of the real session database
+os.environ.setdefault("CROP_BOT_SESSION_BACKEND", "memory")
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from metrics import app_metrics  # noqa: E402
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def widget(at, kind, label):
+    # First widget of a kind whose label starts with the given text
+    return next(w for w in getattr(at, kind) if w.label.startswith(label))
+
+
+INTERACTIONS = {
+    "change_state": lambda at, i: widget(at, "selectbox", "Select your state").select(["Punjab", "Gujarat"][i % 2]),
+    "change_season": lambda at, i: widget(at, "selectbox", "Select the season").select(["Rabi", "Kharif"][i % 2]),
+    "move_slider": lambda at, i: widget(at, "slider", "\U0001F321").set_value(20 + i % 10),
+    "press_predict": lambda at, i: widget(at, "button", "\U0001F4CA").click(),
+    "send_chat": lambda at, i: widget(at, "text_input", "\U0001F9D1").input(f"which crop and soil {i}?"),
+}
+
+# Section timer of what each interaction reruns on a live server
+SCOPES = {
+    "change_state": "rerun",
+    "change_season": "rerun",
+    "move_slider": "prediction_fragment",
+    "press_predict": "prediction_fragment",
+    "send_chat": "chat_fragment",
+}
+
+
+def last_ms(section):
+    sections, _ = app_metrics.snapshot()
+    return sections[section][2] * 1000
+
+
+def timed_run(at):
+    start = time.perf_counter()
+    at.run()
+    elapsed = (time.perf_counter() - start) * 1000
+    if at.exception:
+        raise RuntimeError(f"app raised: {at.exception[0].value}")
+    return elapsed
+
+
+def main(repeats=10):
+    at = AppTest.from_file(APP, default_timeout=60)
+    results = {"first_run_ms": timed_run(at)}
+    for name, interact in INTERACTIONS.items():
+        samples, reruns, scoped = [], [], []
+        for i in range(repeats):
+            interact(at, i)
+            samples.append(timed_run(at))
+            reruns.append(last_ms("rerun"))
+            scoped.append(last_ms(SCOPES[name]))
+        results[f"{name}_ms"] = statistics.median(samples)
+        results[f"{name}_rerun_ms"] = statistics.median(reruns)
+        results[f"{name}_scoped_ms"] = statistics.median(scoped)
+    for name, value in results.items():
+        print(f"{name:<26}: {value:>8.1f} ms")
+    for name in INTERACTIONS:
+        full, scoped = results[f"{name}_rerun_ms"], results[f"{name}_scoped_ms"]
+        print(f"{name:<26}: rerun {full:.1f} ms -> {scoped:.1f} ms ({1 - scoped / full:.0%} less)")
+    return results
+
+
+if __name__ == "__main__":
+    main()
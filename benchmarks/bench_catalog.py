@@ -0,0 +1,30 @@
+# Benchmark of lookups against crop_info, raw dicts and CropCatalog
+# Run from the project root: python -m benchmarks.bench_catalog
+import timeit
+
+from crop_info import catalog, crop_details, crop_yield_ranges, state_season_crop_map
+
+NUMBER = 100_000
+
+
+def per_call_us(fn):
+    return min(timeit.repeat(fn, number=NUMBER, repeat=5)) / NUMBER * 1e6
+
+
+def main():
+    results = {
+        "dict_state_season_us": per_call_us(lambda: state_season_crop_map["Punjab"]["Rabi"]),
+        "dict_crop_details_us": per_call_us(lambda: crop_details["Rice"]["season"]),
+        "dict_yield_ranges_us": per_call_us(lambda: crop_yield_ranges["Rice"]),
+        "catalog_crops_for_us": per_call_us(lambda: catalog.crops_for("Punjab", "Rabi")),
+        "catalog_states_for_us": per_call_us(lambda: catalog.states_for("Rice")),
+        "catalog_canonical_us": per_call_us(lambda: catalog.canonical("Chana")),
+        "catalog_yield_level_us": per_call_us(lambda: catalog.yield_level("Gram", 1.2)),
+    }
+    for name, value in results.items():
+        print(f"{name:<24}: {value:>8.3f} us")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Benchmark of the chatbot intent matcher against the original if/elif chain
+# Run from the project root: python -m benchmarks.bench_chatbot
+import random
+import statistics
+import time
+
+from chat_backend import ChatBackend, KeywordResponder
+
+from chatbot import get_bot_response, matcher
+
+OPENERS = ["", "hello sir ", "namaste, ", "please tell me ", "i am a farmer from nashik, "]
+QUESTIONS = [
+    "which crop is best for my field",
+    "what crops should i plant this year",
+    "how much rainfall does paddy need",
+    "is the temperature too high for wheat",
+    "what soil is good for cotton",
+    "which crop suits black soil and low rain",
+    "when will the monsoon come",
+    "my tomato leaves are turning yellow",
+    "what is the market price of onion",
+]
+CLOSERS = ["", "?", " thank you", " in this season?", " please reply fast"]
+
+
+def legacy_get_bot_response(user_msg, state, season, crops):
+    # get_bot_response as it was written inline in app.py
+    user_msg = user_msg.lower()
+    if "best crop" in user_msg or "which crop" in user_msg:
+        return f"In {state}, during {season}, you can grow: {', '.join(crops)}"
+    elif "rainfall" in user_msg:
+        return "Most Kharif crops need good rainfall, around 100-200mm is ideal."
+    elif "temperature" in user_msg:
+        return "Rabi crops prefer cooler temperatures (10-25°C), while Kharif crops prefer warmer (25-35°C)."
+    elif "soil" in user_msg:
+        return "Black soil is good for cotton, alluvial for rice and wheat, loamy for vegetables."
+    else:
+        return "I'm still learning! Try asking about crops, seasons, soil, rainfall, or temperature."
+
+
+def make_corpus(n, seed=0):
+    rng = random.Random(seed)
+    return [rng.choice(OPENERS) + rng.choice(QUESTIONS) + rng.choice(CLOSERS) for _ in range(n)]
+
+
+def messages_per_second(fn, corpus):
+    start = time.perf_counter()
+    for message in corpus:
+        fn(message)
+    return len(corpus) / (time.perf_counter() - start)
+
+
+def first_token_ms(backend, corpus):
+    samples = []
+    for message in corpus:
+        start = time.perf_counter()
+        tokens = backend.stream(message, "Punjab", "Kharif")
+        next(tokens)
+        samples.append((time.perf_counter() - start) * 1000)
+        tokens.close()
+    return statistics.median(samples)
+
+
+def main(n=100_000):
+    corpus = make_corpus(n)
+    crops = ["Rice", "Cotton"]
+    results = {
+        "legacy_chain_msgs_per_s": messages_per_second(
+            lambda m: legacy_get_bot_response(m, "Punjab", "Kharif", crops), corpus),
+        "intent_match_msgs_per_s": messages_per_second(matcher.match, corpus),
+        "bot_response_msgs_per_s": messages_per_second(
+            lambda m: get_bot_response(m, "Punjab", "Kharif"), corpus),
+    }
+    for name, rate in results.items():
+        print(f"{name:<26}: {rate:>12,.0f} msgs/s ({n:,} messages)")
+    backend = ChatBackend(KeywordResponder())
+    results["stream_first_token_ms"] = first_token_ms(backend, corpus[:1000])
+    backend.close()
+    print(f"{'stream_first_token_ms':<26}: {results['stream_first_token_ms']:>12,.3f} ms (keyword responder)")
+    return results
+
+
+if __name__ == "__main__":
+    main()
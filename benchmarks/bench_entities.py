@@ -0,0 +1,91 @@
+# Benchmark of chat entity extraction as the vocabulary grows from the crop
+# catalog to thousands of district and local-language crop names
+# Run from the project root: python -m benchmarks.bench_entities
+import random
+import time
+
+from chatbot import extractor
+from entities import EntityExtractor, catalog_vocabulary
+
+SYLLABLES = ["ka", "ra", "ma", "na", "pur", "gaon", "bad", "nag", "ur", "sh", "ti", "la", "ko", "de", "va", "ga"]
+# Devanagari consonants and vowel signs for synthetic local crop names
+CONSONANTS = "कखगचजटडतदधनपबमरलवस"
+VOWEL_SIGNS = ["", "ा", "ि", "ी", "ु", "ू", "े", "ो", "ं"]
+LOCAL_CROPS = {"धान": "Rice", "गेहूं": "Wheat", "चना": "Gram (Chana)", "बाजरा": "Millets", "मक्का": "Maize",
+               "कपास": "Cotton", "गन्ना": "Sugarcane", "सरसों": "Mustard", "जौ": "Barley"}
+MESSAGES = [
+    "which crop for {place} in rabi season",
+    "how much rain does {crop} need in {place}",
+    "when to sow {crop} please",
+    "what can i grow in {place} during kharif",
+]
+
+
+def make_vocabulary(n_districts, n_local, seed=0):
+    rng = random.Random(seed)
+    districts = {}
+    while len(districts) < n_districts:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+        districts[name] = "Maharashtra"
+    vocabulary = catalog_vocabulary()
+    crops = dict(vocabulary["crop"], **LOCAL_CROPS)
+    canonical = list(vocabulary["crop"].values())
+    while len(crops) < len(vocabulary["crop"]) + len(LOCAL_CROPS) + n_local:
+        name = "".join(rng.choice(CONSONANTS) + rng.choice(VOWEL_SIGNS) for _ in range(rng.randint(2, 3)))
+        crops.setdefault(name, rng.choice(canonical))
+    vocabulary["crop"] = crops
+    return vocabulary, districts
+
+
+def typo(word, rng):
+    i = rng.randrange(len(word))
+    return word[:i] + word[i + 1:] if len(word) > 5 else word
+
+
+def make_messages(vocabulary, districts, n, seed=0):
+    rng = random.Random(seed)
+    places = list(districts) or list(vocabulary["state"])
+    crops = list(vocabulary["crop"])
+    return [
+        rng.choice(MESSAGES).format(place=typo(rng.choice(places).lower(), rng), crop=typo(rng.choice(crops), rng))
+        for _ in range(n)
+    ]
+
+
+def extract_us(ex, messages):
+    # Cold lookups: the memo is cleared so every typo goes to the index
+    ex.memo_size = 0
+    ex._memo.clear()
+    start = time.perf_counter()
+    for message in messages:
+        ex.extract(message)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def main(n=2000):
+    results = {}
+    levels = [("catalog", 0, 0), ("districts_1k", 1000, 100), ("districts_10k", 10_000, 1000)]
+    for name, n_districts, n_local in levels:
+        vocabulary, districts = make_vocabulary(n_districts, n_local)
+        start = time.perf_counter()
+        ex = EntityExtractor(vocabulary, districts, extractor.stopwords)
+        build_ms = (time.perf_counter() - start) * 1000
+        messages = make_messages(vocabulary, districts, n)
+        results[f"{name}_build_ms"] = build_ms
+        results[f"{name}_extract_us"] = extract_us(ex, messages)
+        print(f"{name:<14}: {len(ex):>6,} names, built in {build_ms:>8.1f} ms, "
+              f"{results[f'{name}_extract_us']:>8.1f} us per message")
+    # The chatbot's own extractor, answering messages it has seen before
+    messages = make_messages(*make_vocabulary(0, 0), n)
+    for message in messages:
+        extractor.extract(message)
+    start = time.perf_counter()
+    for message in messages:
+        extractor.extract(message)
+    results["memo_extract_us"] = (time.perf_counter() - start) / len(messages) * 1e6
+    print(f"{'memoized':<14}: {results['memo_extract_us']:>8.1f} us per message (repeated messages)")
+    return results
+
+
+if __name__ == "__main__":
+    main()
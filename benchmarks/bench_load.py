@@ -0,0 +1,208 @@
+# Concurrent-session load test of app.py. Each simulated farmer is its own
+# AppTest session on its own thread, all in this one process and sharing its
+# cached resources, the way a single Streamlit server shares them.
+# Run from the project root:
+#   python -m benchmarks.bench_load                       # 1, 2, 4, 8 and 16 sessions
+#   python -m benchmarks.run load                         # short sweep against the baseline
+#   python -m benchmarks.bench_load -s 4 16 32 --flows 5  # chosen levels, longer runs
+#   python -m benchmarks.bench_load -s 8 --max-p95-ms 500 # exit 1 when p95 is slower
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+# Keep load-test sessions out of the real session database
+os.environ.setdefault("CROP_BOT_SESSION_BACKEND", "memory")
+
+from streamlit.runtime import Runtime  # noqa: E402
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache  # noqa: E402
+from streamlit.testing.v1 import AppTest, app_test, local_script_runner  # noqa: E402
+
+from benchmarks.bench_app import APP, INTERACTIONS  # noqa: E402
+
+# AppTest is written for one test at a time. A server has one runtime and one
+# compiled script for all its sessions, so the sessions here share them too:
+# AppTest would otherwise install a fresh runtime (with its own st.cache_data
+# storage) for every run and reset it to None afterwards, under sessions still
+# running on other threads, and compile the script on every run, which
+# concurrently can crash Python 3.11's ast module.
+_script_cache = ScriptCache()
+local_script_runner.ScriptCache = lambda: _script_cache
+
+
+class _SharedRuntime:
+    # Stands in for the Runtime class inside app_test: the first runtime it is
+    # given stays installed
+    def __setattr__(self, name, value):
+        if name != "_instance" or Runtime._instance is None and value is not None:
+            setattr(Runtime, name, value)
+
+    def __getattr__(self, name):
+        return getattr(Runtime, name)
+
+    def __dir__(self):
+        return dir(Runtime)
+
+
+app_test.Runtime = _SharedRuntime()
+
+# One scripted visit: pick a region and season, set the weather, predict, ask
+FLOW = ["change_state", "change_season", "move_slider", "press_predict", "send_chat"]
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current size, but the best there is without /proc
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_session(index, flows, think, ready, go, samples, errors):
+    try:
+        at = AppTest.from_file(APP, default_timeout=120)
+        at.run()
+        ready.wait()
+        go.wait()
+        for flow in range(flows):
+            for name in FLOW:
+                INTERACTIONS[name](at, index + flow)
+                start = time.perf_counter()
+                at.run()
+                samples.append((name, (time.perf_counter() - start) * 1000))
+                if at.exception:
+                    errors.append(f"session {index}, {name}: {at.exception[0].value}")
+                if think:
+                    time.sleep(think)
+    except threading.BrokenBarrierError:
+        pass
+    except Exception as e:
+        # Release the other sessions and the coordinator instead of hanging
+        errors.append(f"session {index}: {e!r}")
+        ready.abort()
+        go.abort()
+
+
+_warmed = False
+
+
+def warm_up():
+    # One page load before anything is measured, once per process, so the
+    # imports and st.cache_resource loaders are not billed to the first level
+    global _warmed
+    if not _warmed:
+        at = AppTest.from_file(APP, default_timeout=120)
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"app raised: {at.exception[0].value}")
+        _warmed = True
+
+
+def percentile(values, q):
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def load_level(sessions, flows=3, think=0.0):
+    # Latency and throughput of `sessions` farmers going through FLOW `flows`
+    # times each, after all of them have loaded the page once
+    ready = threading.Barrier(sessions + 1)
+    go = threading.Barrier(sessions + 1)
+    samples, errors = [], []
+    warm_up()
+    rss_before = rss_bytes()
+    threads = [
+        threading.Thread(target=run_session, args=(i, flows, think, ready, go, samples, errors), daemon=True)
+        for i in range(sessions)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        ready.wait()
+        rss_loaded = rss_bytes()
+        start = time.perf_counter()
+        go.wait()
+    except threading.BrokenBarrierError:
+        for thread in threads:
+            thread.join()
+        raise RuntimeError(f"load test with {sessions} sessions failed: {errors[0]}")
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies = [ms for _, ms in samples]
+    by_interaction = {}
+    for name, ms in samples:
+        by_interaction.setdefault(name, []).append(ms)
+    return {
+        "sessions": sessions,
+        "interactions": len(samples),
+        "errors": errors,
+        "interactions_per_s": len(samples) / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mem_per_session_mb": max(rss_loaded - rss_before, 0) / sessions / 2**20,
+        "p95_ms_by_interaction": {name: percentile(values, 95) for name, values in by_interaction.items()},
+    }
+
+
+def print_report(levels):
+    print(f"{'sessions':>8} {'interactions/s':>15} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'MB/session':>11} {'errors':>7}")
+    for level in levels:
+        print(f"{level['sessions']:>8} {level['interactions_per_s']:>15.1f} {level['p50_ms']:>9.1f} "
+              f"{level['p95_ms']:>9.1f} {level['p99_ms']:>9.1f} {level['mem_per_session_mb']:>11.2f} "
+              f"{len(level['errors']):>7}")
+    worst = levels[-1]
+    print(f"p95 by interaction at {worst['sessions']} sessions: "
+          + ", ".join(f"{name} {ms:.1f} ms" for name, ms in worst["p95_ms_by_interaction"].items()))
+    for level in levels:
+        for error in level["errors"][:5]:
+            print(f"ERROR {error}")
+
+
+def main(sessions=(1, 4, 8), flows=2, think=0.0):
+    # Entry point for benchmarks.run: a short sweep flattened into metrics
+    levels = [load_level(n, flows, think) for n in sessions]
+    print_report(levels)
+    results = {}
+    for level in levels:
+        n = level["sessions"]
+        results[f"sessions_{n}_interactions_per_s"] = level["interactions_per_s"]
+        results[f"sessions_{n}_p50_ms"] = level["p50_ms"]
+        results[f"sessions_{n}_p95_ms"] = level["p95_ms"]
+        results[f"sessions_{n}_p99_ms"] = level["p99_ms"]
+        results[f"sessions_{n}_mem_per_session_mb"] = level["mem_per_session_mb"]
+        results[f"sessions_{n}_errors"] = len(level["errors"])
+    return results
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Load test app.py with concurrent simulated sessions")
+    parser.add_argument("-s", "--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                        help="concurrent session counts to run, one after another")
+    parser.add_argument("--flows", type=int, default=3, help="times each session repeats the scripted flow")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause between a session's interactions")
+    parser.add_argument("--max-p95-ms", type=float, help="fail when any level's p95 latency exceeds this")
+    args = parser.parse_args(argv)
+    levels = []
+    for n in args.sessions:
+        print(f"== {n} sessions x {args.flows} flows")
+        levels.append(load_level(n, args.flows, args.think_ms / 1000))
+    print_report(levels)
+    failed = any(level["errors"] for level in levels)
+    if args.max_p95_ms is not None:
+        slow = [level for level in levels if level["p95_ms"] > args.max_p95_ms]
+        for level in slow:
+            print(f"REGRESSION p95 at {level['sessions']} sessions: {level['p95_ms']:.1f} ms > {args.max_p95_ms} ms")
+        failed = failed or bool(slow)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,74 @@
+# Benchmark of predict_yield_batch against a Python loop over predict_yield
+# Run from the project root: python -m benchmarks.bench_model
+import time
+import timeit
+
+import numpy as np
+
+from model import predict_yield, predict_yield_batch
+
+
+def legacy_predict_yield(crop, temperature, rainfall):
+    # predict_yield as it was before the batch path and the coefficient
+    # registry existed, kept as a speed reference
+    if crop.lower() == "paddy":
+        return round((rainfall * 0.1 + temperature * 0.2) / 2, 2)
+    elif crop.lower() == "wheat":
+        return round((rainfall * 0.08 + temperature * 0.15) / 2, 2)
+    else:
+        return round((rainfall * 0.05 + temperature * 0.1) / 2, 2)
+
+
+CROPS = ["Rice", "Paddy", "Wheat", "Maize", "Cotton", "Sugarcane"]
+
+
+def make_plots(n, seed=0):
+    rng = np.random.default_rng(seed)
+    crops = rng.choice(CROPS, size=n)
+    temperatures = rng.integers(10, 46, size=n)
+    rainfalls = rng.integers(0, 301, size=n)
+    return crops, temperatures, rainfalls
+
+
+def rows_per_second(fn, n):
+    start = time.perf_counter()
+    fn()
+    return n / (time.perf_counter() - start)
+
+
+def main(n_loop=200_000, n_batch=1_000_000):
+    crops, temperatures, rainfalls = make_plots(n_batch)
+
+    loop_crops = crops[:n_loop].tolist()
+    loop_temps = temperatures[:n_loop].tolist()
+    loop_rains = rainfalls[:n_loop].tolist()
+    scalar = [predict_yield(c, t, r) for c, t, r in zip(loop_crops, loop_temps, loop_rains)]
+    batch = predict_yield_batch(loop_crops, loop_temps, loop_rains)
+    assert np.array_equal(np.array(scalar), batch), "batch results differ from predict_yield"
+
+    legacy_rate = rows_per_second(
+        lambda: [legacy_predict_yield(c, t, r) for c, t, r in zip(loop_crops, loop_temps, loop_rains)], n_loop
+    )
+    wrapper_rate = rows_per_second(
+        lambda: [predict_yield(c, t, r) for c, t, r in zip(loop_crops, loop_temps, loop_rains)], n_loop
+    )
+    batch_rate = rows_per_second(lambda: predict_yield_batch(crops, temperatures, rainfalls), n_batch)
+    latency_us = min(
+        timeit.repeat(lambda: predict_yield("Rice", 25, 100), number=10_000, repeat=5)
+    ) / 10_000 * 1e6
+
+    print(f"legacy predict_yield loop : {legacy_rate:>14,.0f} rows/s")
+    print(f"predict_yield loop        : {wrapper_rate:>14,.0f} rows/s")
+    print(f"predict_yield_batch       : {batch_rate:>14,.0f} rows/s")
+    print(f"batch vs legacy loop      : {batch_rate / legacy_rate:>14,.1f}x")
+    print(f"predict_yield latency     : {latency_us:>14,.2f} us")
+    return {
+        "legacy_loop_rows_per_s": legacy_rate,
+        "loop_rows_per_s": wrapper_rate,
+        "batch_rows_per_s": batch_rate,
+        "predict_yield_us": latency_us,
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# Benchmark of the Monte Carlo yield risk simulation
+# Run from the project root: python -m benchmarks.bench_risk
+import time
+
+import risk
+
+
+def main(scenarios=1_000_000, state="Maharashtra", season="Kharif"):
+    climates = risk.load_climates()
+    start = time.perf_counter()
+    risk.simulate("Cotton", state, season, scenarios, climates=climates)
+    single = scenarios / (time.perf_counter() - start)
+    results = {"single_crop_scenarios_per_s": single}
+    for name, workers in (("inline", 1), ("pool", None)):
+        start = time.perf_counter()
+        summaries = risk.simulate_state(state, season, scenarios, workers=workers)
+        elapsed = time.perf_counter() - start
+        results[f"state_{name}_scenarios_per_s"] = scenarios * len(summaries) / elapsed
+    for name, rate in results.items():
+        print(f"{name:<32}: {rate:>14,.0f} scenarios/s")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+# Benchmark of the chunked bulk scorer on a synthetic plot CSV
+# Run from the project root: python -m benchmarks.bench_score
+import os
+import tempfile
+import time
+
+import score_csv
+
+
+def main(rows=500_000, chunk_rows=50_000):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        plots = os.path.join(tmp, "plots.csv")
+        score_csv.make_sample(plots, rows)
+        for name, workers in (("inline", 1), ("pool", None)):
+            output = os.path.join(tmp, f"{name}.csv")
+            start = time.perf_counter()
+            score_csv.score_file(plots, output, chunk_rows, workers, restart=True)
+            results[f"score_{name}_rows_per_s"] = rows / (time.perf_counter() - start)
+    for name, rate in results.items():
+        print(f"{name:<28}: {rate:>12,.0f} rows/s")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Cold-load time and prediction latency of the trained regression model
+# Run from the project root: python -m benchmarks.bench_trained
+import os
+import statistics
+import tempfile
+import time
+import timeit
+
+import numpy as np
+
+from model import TrainedYieldModel
+from train_model import make_sample
+
+
+def main(train_rows=20_000, n_batch=1_000_000):
+    sample = make_sample(train_rows)
+    model = TrainedYieldModel.fit(sample["crop"], sample["temperature"], sample["rainfall"], sample["yield"])
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "yield_model.npz")
+        model.save(path)
+        loads = []
+        for _ in range(20):
+            start = time.perf_counter()
+            TrainedYieldModel.load(path)
+            loads.append((time.perf_counter() - start) * 1000)
+
+    predict_us = min(timeit.repeat(lambda: model.predict("Rice", 25, 100), number=10_000, repeat=5)) / 10_000 * 1e6
+    rng = np.random.default_rng(0)
+    crops = rng.choice(list(model.crops), size=n_batch).tolist()
+    temperatures = rng.uniform(10, 45, size=n_batch)
+    rainfalls = rng.uniform(0, 300, size=n_batch)
+    start = time.perf_counter()
+    model.predict_batch(crops, temperatures, rainfalls)
+    batch_rate = n_batch / (time.perf_counter() - start)
+
+    results = {
+        "cold_load_ms": statistics.median(loads),
+        "predict_us": predict_us,
+        "batch_rows_per_s": batch_rate,
+    }
+    print(f"cold load          : {results['cold_load_ms']:>12.2f} ms")
+    print(f"predict latency    : {predict_us:>12.2f} us")
+    print(f"predict_batch      : {batch_rate:>12,.0f} rows/s")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# Benchmark of the daily-weather feature store: ingesting days and reading a
+# window's features, which must not slow down as the history grows
+# Run from the project root: python -m benchmarks.bench_weather
+import datetime
+import tempfile
+import time
+
+from weather_store import WeatherStore
+
+LOCATIONS = 500
+
+
+def ingest(store, days):
+    # Days per second for one day at every location
+    start = time.perf_counter()
+    for day in days:
+        for i in range(LOCATIONS):
+            store.append(f"district_{i}", day, 25.0, 3.0)
+    return len(days) * LOCATIONS / (time.perf_counter() - start)
+
+
+def main(years=4):
+    results = {}
+    start_day = datetime.date(2020, 1, 1)
+    days = [start_day + datetime.timedelta(days=k) for k in range(365 * years)]
+    with tempfile.TemporaryDirectory() as tmp:
+        store = WeatherStore(tmp)
+        results["append_first_year_days_per_s"] = ingest(store, days[:365])
+        ingest(store, days[365:-365])
+        results["append_last_year_days_per_s"] = ingest(store, days[-365:])
+        start = time.perf_counter()
+        n = 0
+        for i in range(LOCATIONS):
+            for season in ("Kharif", "Rabi", "Zaid"):
+                store.state_features(f"district_{i}", season)
+                n += 1
+        results["features_us"] = (time.perf_counter() - start) / n * 1e6
+        store.close()
+    for name, value in results.items():
+        unit = "us" if name.endswith("_us") else "days/s"
+        print(f"{name:<32}: {value:>12,.1f} {unit}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
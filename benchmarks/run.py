@@ -0,0 +1,122 @@
+# Runs the benchmark suites, saves the results as JSON and compares them with
+# a stored baseline. Run from the project root:
+#   python -m benchmarks.run                      # all suites
+#   python -m benchmarks.run model chatbot        # selected suites
+#   python -m benchmarks.run --save-baseline      # store this run as the baseline
+# A run with any *_errors metric above zero fails and is never saved as a baseline.
+import argparse
+import datetime
+import importlib
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+SUITES = ["model", "trained", "catalog", "chatbot", "entities", "risk", "score", "weather", "app", "load"]
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def higher_is_better(metric):
+    return metric.endswith("_per_s")
+
+
+def failures(results):
+    # [(suite, metric, value)] for every error count above zero, which fails a
+    # run whatever the baseline says
+    return [(suite, metric, value) for suite, metrics in results["suites"].items()
+            for metric, value in metrics.items() if metric.endswith("_errors") and value]
+
+
+def compare(results, baseline, tolerance):
+    # [(suite, metric, baseline value, new value, change)] for every metric
+    # that got worse by more than the tolerance
+    regressions = []
+    for suite, metrics in results["suites"].items():
+        for metric, value in metrics.items():
+            old = baseline["suites"].get(suite, {}).get(metric)
+            if old is None:
+                continue
+            if old == 0:
+                # No relative change from zero: for a metric that should stay
+                # low, such as an error count, any increase is a regression
+                if value > 0 and not higher_is_better(metric):
+                    regressions.append((suite, metric, old, value, math.inf))
+                continue
+            change = (value - old) / old
+            if higher_is_better(metric):
+                change = -change
+            if change > tolerance:
+                regressions.append((suite, metric, old, value, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the crop chatbot benchmarks")
+    parser.add_argument("suites", nargs="*", help=f"suites to run: {', '.join(SUITES)} (default: all)")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown before a metric is flagged (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--output", help="results file (default: results/<timestamp>.json)")
+    args = parser.parse_args(argv)
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+
+    results = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "suites": {},
+    }
+    for suite in args.suites or SUITES:
+        print(f"== {suite}")
+        module = importlib.import_module(f"benchmarks.bench_{suite}")
+        results["suites"][suite] = module.main()
+
+    output = args.output or os.path.join(RESULTS_DIR, results["timestamp"].replace(":", "-") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {output}")
+
+    failed = failures(results)
+    for suite, metric, value in failed:
+        print(f"FAILED {suite}.{metric}: {value}")
+    if failed:
+        return 1
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against, run with --save-baseline to store one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    for suite, metric, old, new, change in regressions:
+        worse = "up from zero" if math.isinf(change) else f"{change:+.0%} worse"
+        print(f"REGRESSION {suite}.{metric}: {old:,.3f} -> {new:,.3f} ({worse})")
+    if not regressions:
+        print(f"no regressions against {args.baseline} (commit {baseline.get('commit')})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
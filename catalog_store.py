@@ -0,0 +1,286 @@
+# catalog_store.py
+# Compiles the crop reference CSVs in data/ into one binary file and reads it
+# back lazily. Rebuild by hand with: python catalog_store.py
+#
+# File layout:
+#   b"CROPCAT1", header length (uint64), JSON header, padding to 8 bytes,
+#   then one packed row per (state, district, season, crop) in crop_regions.csv,
+#   grouped by state. The header holds the string tables, each state's row range
+#   and the small crop-level tables. Rows are memory-mapped and a state is only
+#   decoded the first time it is looked up.
+import csv
+import json
+import os
+import struct
+import threading
+from collections.abc import Mapping
+
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SOURCES = {
+    "regions": "crop_regions.csv",
+    "details": "crop_details.csv",
+    "yield_ranges": "crop_yield_ranges.csv",
+    "aliases": "crop_aliases.csv",
+    "state_crops": "state_crops.csv",
+    "season_crops": "season_crops.csv",
+}
+COMPILED_FILE = os.path.join(DATA_DIR, "crop_catalog.bin")
+MAGIC = b"CROPCAT1"
+ROW_DTYPE = np.dtype([("state", "<u2"), ("district", "<u2"), ("season", "<u1"), ("crop", "<u2")])
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def _source_stamp(data_dir):
+    stamp = {}
+    for name, filename in SOURCES.items():
+        info = os.stat(os.path.join(data_dir, filename))
+        stamp[name] = [info.st_size, info.st_mtime_ns]
+    return stamp
+
+
+def split_states(states):
+    return [state.strip() for state in states.split(",") if state.strip()]
+
+
+def compile_catalog(data_dir=DATA_DIR):
+    # Build the binary catalog from the CSV sources, returns its bytes.
+    # Cross-table checks run here, once, and are stored in the header.
+    details = {row["crop"]: {"season": row["season"], "states": row["states"]}
+               for row in _read_csv(os.path.join(data_dir, SOURCES["details"]))}
+    yield_ranges = {row["crop"]: {"good": float(row["good"]), "average": float(row["average"])}
+                    for row in _read_csv(os.path.join(data_dir, SOURCES["yield_ranges"]))}
+    aliases = {row["alias"]: row["crop"] for row in _read_csv(os.path.join(data_dir, SOURCES["aliases"]))}
+    names = {crop.lower(): crop for crop in details}
+    names.update({alias.lower(): crop for alias, crop in aliases.items() if crop in details})
+
+    def canonical(name):
+        return names.get(name.strip().lower(), name)
+
+    states, districts, seasons, crops = {}, {"": 0}, {}, {}
+    rows = []
+    crop_states = {crop: dict.fromkeys(split_states(info["states"])) for crop, info in details.items()}
+    unknown = set()
+    for row in _read_csv(os.path.join(data_dir, SOURCES["regions"])):
+        state, crop = row["state"], row["crop"]
+        rows.append((
+            states.setdefault(state, len(states)),
+            districts.setdefault(row["district"], len(districts)),
+            seasons.setdefault(row["season"], len(seasons)),
+            crops.setdefault(crop, len(crops)),
+        ))
+        if canonical(crop) not in details:
+            unknown.add(crop)
+        crop_states.setdefault(canonical(crop), {})[state] = None
+    # Older hand-kept crop lists, which only add states to crop_states
+    state_based_crops, season_based_crops = {}, {}
+    listed = set()
+    for row in _read_csv(os.path.join(data_dir, SOURCES["season_crops"])):
+        season_based_crops.setdefault(row["season"], {})[row["crop"]] = row["states"]
+        listed.add(row["crop"])
+        crop_states.setdefault(canonical(row["crop"]), {}).update(dict.fromkeys(split_states(row["states"])))
+    for row in _read_csv(os.path.join(data_dir, SOURCES["state_crops"])):
+        state_based_crops.setdefault(row["state"], []).append(row["crop"])
+        listed.add(row["crop"])
+        crop_states.setdefault(canonical(row["crop"]), {})[row["state"]] = None
+    for field, strings in zip(ROW_DTYPE.names, (states, districts, seasons, crops)):
+        # Each row stores string table indexes, which must fit their fields
+        limit = np.iinfo(ROW_DTYPE[field]).max + 1
+        if len(strings) > limit:
+            raise ValueError(f"{SOURCES['regions']} has {len(strings):,} distinct {field} values, "
+                             f"the compiled catalog holds at most {limit:,}")
+
+    issues = [f"alias {alias!r} points to unknown crop {crop!r}"
+              for alias, crop in aliases.items() if crop not in details]
+    if unknown:
+        issues.append(f"crops missing from crop_details: {', '.join(sorted(unknown))}")
+    unlisted = {crop for crop in listed if canonical(crop) not in details}
+    if unlisted:
+        issues.append(f"crops in {SOURCES['season_crops']}/{SOURCES['state_crops']} missing from crop_details: "
+                      f"{', '.join(sorted(unlisted))}")
+    for crop, ranges in yield_ranges.items():
+        if canonical(crop) not in details:
+            issues.append(f"yield ranges for unknown crop {crop!r}")
+        if ranges["good"] < ranges["average"]:
+            issues.append(f"yield ranges for {crop!r} have good below average")
+    covered = {canonical(crop) for crop in yield_ranges}
+    missing = [crop for crop in details if crop not in covered]
+    if missing:
+        issues.append(f"crops without yield ranges: {', '.join(missing)}")
+
+    table = np.array(rows, dtype=np.int64).reshape(-1, 4)
+    order = np.argsort(table[:, 0], kind="stable")
+    packed = np.zeros(len(rows), dtype=ROW_DTYPE)
+    for i, field in enumerate(ROW_DTYPE.names):
+        packed[field] = table[order, i]
+    bounds = np.searchsorted(packed["state"], np.arange(len(states) + 1))
+
+    header = {
+        "rows": len(rows),
+        "states": {state: [int(bounds[i]), int(bounds[i + 1])] for state, i in states.items()},
+        "districts": list(districts),
+        "seasons": list(seasons),
+        "crops": list(crops),
+        "crop_details": details,
+        "crop_yield_ranges": yield_ranges,
+        "aliases": aliases,
+        "crop_states": {crop: list(found) for crop, found in crop_states.items()},
+        "state_based_crops": state_based_crops,
+        "season_based_crops": season_based_crops,
+        "issues": issues,
+        "sources": _source_stamp(data_dir),
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    start = len(MAGIC) + 8 + len(header_bytes)
+    padding = b"\0" * (-start % 8)
+    return MAGIC + struct.pack("<Q", len(header_bytes)) + header_bytes + padding + packed.tobytes()
+
+
+class CatalogStore:
+    # Read side of the compiled catalog. Opening it reads only the header; the
+    # rows stay memory-mapped and each state is decoded on first access.
+    def __init__(self, path=None, data=None):
+        if data is None:
+            with open(path, "rb") as f:
+                magic, header_len = f.read(len(MAGIC)), f.read(8)
+                if magic != MAGIC:
+                    raise ValueError(f"{path} is not a compiled crop catalog")
+                header_len = struct.unpack("<Q", header_len)[0]
+                header = f.read(header_len)
+        else:
+            if data[:len(MAGIC)] != MAGIC:
+                raise ValueError("not a compiled crop catalog")
+            header_len = struct.unpack("<Q", data[len(MAGIC):len(MAGIC) + 8])[0]
+            header = data[len(MAGIC) + 8:len(MAGIC) + 8 + header_len]
+        self.header = json.loads(header)
+        offset = len(MAGIC) + 8 + header_len
+        offset += -offset % 8
+        count = self.header["rows"]
+        if count == 0:
+            self._rows = np.zeros(0, dtype=ROW_DTYPE)
+        elif data is None:
+            self._rows = np.memmap(path, dtype=ROW_DTYPE, mode="r", offset=offset, shape=(count,))
+        else:
+            self._rows = np.frombuffer(data, dtype=ROW_DTYPE, count=count, offset=offset)
+        self.states = tuple(self.header["states"])
+        self.seasons = tuple(self.header["seasons"])
+        self.crop_details = self.header["crop_details"]
+        self.crop_yield_ranges = self.header["crop_yield_ranges"]
+        self.aliases = self.header["aliases"]
+        self.crop_states = self.header["crop_states"]
+        self.state_based_crops = self.header["state_based_crops"]
+        self.season_based_crops = self.header["season_based_crops"]
+        self.issues = self.header["issues"]
+        self._decoded = {}
+        self._district_ids = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.header["rows"]
+
+    def is_current(self, data_dir=DATA_DIR):
+        # False once a source CSV has changed since this catalog was compiled
+        try:
+            return self.header.get("sources") == _source_stamp(data_dir)
+        except OSError:
+            return True
+
+    def _state_rows(self, state):
+        start, stop = self.header["states"][state]
+        return self._rows[start:stop]
+
+    def state_seasons(self, state):
+        # {season: [crops]} for a state, merged over its districts
+        seasons = self._decoded.get(state)
+        if seasons is None:
+            rows = self._state_rows(state)
+            found = {season: {} for season in self.seasons}
+            for season, crop in zip(rows["season"].tolist(), rows["crop"].tolist()):
+                found[self.seasons[season]][self.header["crops"][crop]] = None
+            seasons = {season: list(crops) for season, crops in found.items()}
+            with self._lock:
+                self._decoded[state] = seasons
+        return seasons
+
+    def districts(self, state):
+        rows = self._state_rows(state)
+        ids = dict.fromkeys(rows["district"].tolist())
+        return [self.header["districts"][i] for i in ids if i != 0]
+
+    def district_seasons(self, state, district):
+        # {season: [crops]} for one district, decoded on every call
+        if self._district_ids is None:
+            self._district_ids = {name: i for i, name in enumerate(self.header["districts"])}
+        district_id = self._district_ids[district]
+        rows = self._state_rows(state)
+        rows = rows[rows["district"] == district_id]
+        found = {season: {} for season in self.seasons}
+        for season, crop in zip(rows["season"].tolist(), rows["crop"].tolist()):
+            found[self.seasons[season]][self.header["crops"][crop]] = None
+        return {season: list(crops) for season, crops in found.items()}
+
+    def decoded_states(self):
+        return len(self._decoded)
+
+
+class StateSeasonMap(Mapping):
+    # Read-only {state: {season: [crops]}} view with the same shape as the old
+    # state_season_crop_map dict, decoding states as they are used
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, state):
+        if state not in self._store.header["states"]:
+            raise KeyError(state)
+        return self._store.state_seasons(state)
+
+    def __iter__(self):
+        return iter(self._store.states)
+
+    def __len__(self):
+        return len(self._store.states)
+
+
+def _is_current(path, data_dir):
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return False
+            header = json.loads(f.read(struct.unpack("<Q", f.read(8))[0]))
+        return header.get("sources") == _source_stamp(data_dir)
+    except (OSError, ValueError, struct.error):
+        return False
+
+
+def open_catalog(path=COMPILED_FILE, data_dir=DATA_DIR):
+    # Open the compiled catalog, recompiling it first when a source CSV has
+    # changed. If the data directory is read-only the catalog lives in memory.
+    if _is_current(path, data_dir):
+        return CatalogStore(path)
+    data = compile_catalog(data_dir)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError:
+        return CatalogStore(data=data)
+    return CatalogStore(path)
+
+
+if __name__ == "__main__":
+    data = compile_catalog()
+    # Replaced in one step, so a running app never maps a half-written file
+    tmp = f"{COMPILED_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, COMPILED_FILE)
+    store = CatalogStore(COMPILED_FILE)
+    print(f"wrote {COMPILED_FILE}: {len(store):,} rows, {len(store.states)} states, {len(data):,} bytes")
+    for issue in store.issues:
+        print(f"warning: {issue}")
@@ -0,0 +1,239 @@
+# chat_backend.py
+# Streaming chatbot replies. A responder is anything with an async
+# stream(message, state, season) generator of text tokens; ChatBackend runs it
+# on one event loop per process, limits how many replies are generated at once
+# and falls back to the keyword answers from chatbot.py when it is too slow.
+#   CROP_BOT_CHAT_BACKEND=keyword            keyword answers, streamed word by word
+#   CROP_BOT_CHAT_BACKEND=scripted           deterministic stand-in with delays
+#   CROP_BOT_CHAT_BACKEND=package.module:fn  blocking generator fn(message, state, season)
+import asyncio
+import importlib
+import os
+import queue
+import re
+import threading
+
+from chatbot import get_bot_response
+
+CHAT_BACKEND = os.environ.get("CROP_BOT_CHAT_BACKEND", "keyword")
+MAX_CONCURRENT = int(os.environ.get("CROP_BOT_CHAT_CONCURRENCY", 4))
+FIRST_TOKEN_TIMEOUT = float(os.environ.get("CROP_BOT_CHAT_FIRST_TOKEN_TIMEOUT", 2.0))
+REPLY_TIMEOUT = float(os.environ.get("CROP_BOT_CHAT_TIMEOUT", 20.0))
+
+_PIECES = re.compile(r"\s*\S+\s*")
+
+
+def split_tokens(text):
+    # Words with their surrounding whitespace, so "".join() gives the text back
+    return _PIECES.findall(text) or [text]
+
+
+class Responder:
+    async def stream(self, message, state, season):
+        raise NotImplementedError
+        yield
+
+
+class KeywordResponder(Responder):
+    # The intent-matcher answers, streamed a word at a time
+    def __init__(self, cache=None):
+        self.cache = cache
+
+    async def stream(self, message, state, season):
+        for token in split_tokens(get_bot_response(message, state, season, cache=self.cache)):
+            yield token
+
+
+class ScriptedResponder(Responder):
+    # Deterministic stand-in for a model in tests and benchmarks: a fixed reply
+    # (the keyword answer by default) after first_token_delay seconds, then one
+    # token every token_delay seconds
+    def __init__(self, reply=None, first_token_delay=0.0, token_delay=0.0, cache=None):
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.cache = cache
+
+    async def stream(self, message, state, season):
+        text = self.reply if self.reply is not None else get_bot_response(message, state, season, cache=self.cache)
+        await asyncio.sleep(self.first_token_delay)
+        for i, token in enumerate(split_tokens(text)):
+            if i and self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield token
+
+
+class ThreadedResponder(Responder):
+    # Adapter for blocking generators, such as a local model's decode loop or a
+    # retrieval index: generate(message, state, season) yields text pieces and
+    # each step runs on a worker thread so the event loop keeps serving others
+    def __init__(self, generate):
+        self.generate = generate
+
+    async def stream(self, message, state, season):
+        done = object()
+        pieces = None
+        # Steps are shielded: cancelling the stream cannot stop a thread, so
+        # the step keeps running and is waited for below
+        step = asyncio.ensure_future(asyncio.to_thread(lambda: iter(self.generate(message, state, season))))
+        try:
+            pieces = await asyncio.shield(step)
+            while True:
+                step = asyncio.ensure_future(asyncio.to_thread(next, pieces, done))
+                piece = await asyncio.shield(step)
+                if piece is done:
+                    return
+                yield piece
+        finally:
+            # A reply cut off by a timeout or an abandoned stream: let the step
+            # in flight return, then close the generator, on a worker thread as
+            # its cleanup may block too. Until then the reply holds its slot.
+            if not step.done():
+                await asyncio.wait([step])
+            if pieces is None and not step.cancelled() and step.exception() is None:
+                pieces = step.result()
+            close = getattr(pieces, "close", None)
+            if close is not None:
+                await asyncio.to_thread(close)
+
+
+class ChatBackend:
+    # Runs a responder for synchronous callers such as a Streamlit script.
+    # stream() returns a plain generator of tokens fed from a private event loop
+    # thread. At most max_concurrent replies are generated at a time; a reply
+    # that cannot start, or whose first token takes longer than
+    # first_token_timeout, is answered from the keyword matcher instead. A reply
+    # that stalls after streaming started is cut at reply_timeout.
+    def __init__(self, responder, max_concurrent=MAX_CONCURRENT, first_token_timeout=FIRST_TOKEN_TIMEOUT,
+                 reply_timeout=REPLY_TIMEOUT, cache=None):
+        self.responder = responder
+        self.max_concurrent = max_concurrent
+        self.first_token_timeout = first_token_timeout
+        self.reply_timeout = reply_timeout
+        self.cache = cache
+        self.replies = 0
+        self.fallbacks = 0
+        self.truncated = 0
+        self.errors = 0
+        self.active = 0
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="chat-backend", daemon=True)
+        self._thread.start()
+        self._slots = asyncio.run_coroutine_threadsafe(self._make_slots(), self._loop).result()
+
+    async def _make_slots(self):
+        return asyncio.Semaphore(self.max_concurrent)
+
+    def _count(self, name, value=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    async def _produce(self, message, state, season, out):
+        # Puts ("token", text) items on out, then one of ("done" | "busy" |
+        # "timeout" | "error", None)
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.first_token_timeout)
+        except asyncio.TimeoutError:
+            out.put(("busy", None))
+            return
+        self._count("active")
+        tokens = self.responder.stream(message, state, season)
+        pending = None
+        try:
+            deadline = loop.time() + self.reply_timeout
+            timeout = min(self.first_token_timeout, self.reply_timeout)
+            while True:
+                # Not wait_for, which would hold back the timeout until the
+                # responder has finished cancelling
+                pending = asyncio.ensure_future(tokens.__anext__())
+                await asyncio.wait([pending], timeout=max(timeout, 0))
+                if not pending.done():
+                    out.put(("timeout", None))
+                    return
+                try:
+                    token = pending.result()
+                except StopAsyncIteration:
+                    out.put(("done", None))
+                    return
+                if token:
+                    out.put(("token", token))
+                timeout = deadline - loop.time()
+        except Exception:
+            self._count("errors")
+            out.put(("error", None))
+        finally:
+            # Shielded, as stream() cancels this task once it has its answer
+            await asyncio.shield(asyncio.ensure_future(self._finish(tokens, pending)))
+
+    async def _finish(self, tokens, pending):
+        # The slot is given back only once the responder has stopped working
+        # on the reply
+        try:
+            if pending is not None and not pending.done():
+                pending.cancel()
+                await asyncio.gather(pending, return_exceptions=True)
+            await tokens.aclose()
+        finally:
+            self._count("active", -1)
+            self._slots.release()
+
+    def stream(self, message, state, season):
+        out = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(self._produce(message, state, season, out), self._loop)
+        streamed = False
+        try:
+            while True:
+                try:
+                    kind, token = out.get(timeout=self.first_token_timeout + self.reply_timeout)
+                except queue.Empty:
+                    kind = "timeout"
+                if kind != "token":
+                    break
+                streamed = True
+                yield token
+        finally:
+            # Also stops generation when the caller abandons the stream,
+            # e.g. a Streamlit rerun interrupting the script
+            future.cancel()
+        if kind == "done":
+            self._count("replies")
+        elif streamed:
+            self._count("truncated")
+            yield "…"
+        else:
+            self._count("fallbacks")
+            yield from split_tokens(get_bot_response(message, state, season, cache=self.cache))
+
+    def reply(self, message, state, season):
+        return "".join(self.stream(message, state, season))
+
+    async def _cancel_pending(self):
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self):
+        # Let abandoned replies finish cancelling before the loop stops, or
+        # asyncio reports them as destroyed while pending
+        if self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._cancel_pending(), self._loop).result(timeout=5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    def stats(self):
+        return {"active": self.active, "replies": self.replies, "fallbacks": self.fallbacks,
+                "truncated": self.truncated, "errors": self.errors}
+
+
+def make_responder(kind=CHAT_BACKEND, cache=None):
+    if kind == "keyword":
+        return KeywordResponder(cache)
+    if kind == "scripted":
+        return ScriptedResponder(first_token_delay=0.2, token_delay=0.03, cache=cache)
+    if ":" in kind:
+        module, _, name = kind.partition(":")
+        return ThreadedResponder(getattr(importlib.import_module(module), name))
+    raise ValueError(f"unknown chat backend {kind!r}, expected keyword, scripted or module:function")
@@ -0,0 +1,220 @@
+# chatbot.py
+import json
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+from itertools import islice
+
+import crop_info
+from entities import STOPWORDS, EntityExtractor, catalog_districts, catalog_vocabulary
+
+INTENTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intents.json")
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+class IntentMatcher:
+    # Token trie over every keyword phrase in the intent table. One scan over
+    # the message's tokens finds all phrases, and each intent scores the number
+    # of tokens its matched phrases cover.
+    def __init__(self, intents):
+        self._order = {intent: i for i, intent in enumerate(intents)}
+        self._root = ({}, [])
+        for intent, keywords in intents.items():
+            for phrase in keywords:
+                tokens = tokenize(phrase)
+                if not tokens:
+                    continue
+                node = self._root
+                for token in tokens:
+                    node = node[0].setdefault(token, ({}, []))
+                node[1].append((intent, len(tokens)))
+
+    def match(self, message):
+        # [(intent, score), ...] best first, ties in intent table order
+        tokens = tokenize(message)
+        children = self._root[0]
+        scores = {}
+        for i, token in enumerate(tokens):
+            node = children.get(token)
+            j = i + 1
+            while node is not None:
+                for intent, weight in node[1]:
+                    scores[intent] = scores.get(intent, 0) + weight
+                if j == len(tokens):
+                    break
+                node = node[0].get(tokens[j])
+                j += 1
+        if len(scores) < 2:
+            return list(scores.items())
+        return sorted(scores.items(), key=lambda item: (-item[1], self._order[item[0]]))
+
+
+def load_intents(path=INTENTS_FILE):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+intent_table = load_intents()
+matcher = IntentMatcher({name: spec["keywords"] for name, spec in intent_table["intents"].items()})
+
+
+# Intents whose answer mentions the selected state or season, or a crop
+context_intents = {name for name, spec in intent_table["intents"].items() if "{" in spec["answer"]}
+crop_intents = {name for name, spec in intent_table["intents"].items()
+                if "{crop}" in spec["answer"] or "{crop_" in spec["answer"]}
+
+# States, seasons and crops named in a message, typos included. Intent keywords
+# are real words, so they are never read as a misspelt entity.
+def build_extractor():
+    return EntityExtractor(
+        catalog_vocabulary(),
+        catalog_districts(),
+        STOPWORDS | {token for spec in intent_table["intents"].values() for phrase in spec["keywords"]
+                     for token in tokenize(phrase)},
+    )
+
+
+extractor = build_extractor()
+_extractor_version = crop_info.version
+
+
+class ResponseCache:
+    # Bounded LRU of rendered answers keyed on (intents, state, season), shared
+    # by every session. Entries are dropped as soon as crop_info reloads the
+    # catalog, since "best crop" and crop answers are rendered from it.
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._catalog_version = crop_info.version
+        self._lock = threading.Lock()
+
+    def _check_catalog(self):
+        if self._catalog_version != crop_info.version:
+            self._entries.clear()
+            self._catalog_version = crop_info.version
+            self.invalidations += 1
+
+    def get(self, key):
+        with self._lock:
+            self._check_catalog()
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._check_catalog()
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def answer_for(intent, state, season, crop=None):
+    template = intent_table["intents"][intent]["answer"]
+    fields = {"state": state, "season": season}
+    if "{crops}" in template:
+        fields["crops"] = ", ".join(crop_info.catalog.crops_for(state, season))
+    if crop is not None:
+        details = crop_info.catalog.details(crop) or {}
+        fields["crop"] = crop
+        fields["crop_season"] = details.get("season", "its usual season")
+        fields["crop_states"] = ", ".join(crop_info.catalog.states_for(crop)) or "several states"
+    return template.format(**fields)
+
+
+def current_extractor():
+    # The extractor for the current catalog, rebuilt after crop_info reloads it
+    global extractor, _extractor_version
+    version = crop_info.maybe_reload()
+    if version != _extractor_version:
+        extractor, _extractor_version = build_extractor(), version
+    return extractor
+
+
+def get_bot_response(user_msg, state, season, cache=None):
+    # A state or season named in the message wins over the selected one
+    entities = current_extractor().matches(user_msg)
+    state = entities.get("state", (state,))[0]
+    season = entities.get("season", (season,))[0]
+    crop, crop_exact = entities.get("crop", (None, False))
+    intents = tuple(intent for intent, _ in matcher.match(user_msg))
+    if crop is None:
+        intents = tuple(intent for intent in intents if intent not in crop_intents)
+    elif not intents and crop_exact:
+        # A message that only names a crop gets its details. A name found by
+        # its spelling alone ("union" for Onion) is not enough for that.
+        intents = tuple(name for name in intent_table["intents"] if name in crop_intents)
+    if not intents:
+        return intent_table["fallback"]
+    if cache is None:
+        return "\n\n".join(answer_for(intent, state, season, crop) for intent in intents)
+    if context_intents.isdisjoint(intents):
+        key = (intents, None, None, None)
+    else:
+        key = (intents, state, season, None if crop_intents.isdisjoint(intents) else crop)
+    reply = cache.get(key)
+    if reply is None:
+        reply = "\n\n".join(answer_for(intent, state, season, crop) for intent in intents)
+        cache.put(key, reply)
+    return reply
+
+
+class ChatHistory:
+    # Fixed-capacity ring buffer of chat messages, oldest dropped first.
+    # Pages are counted from the newest end so page 0 is always the latest.
+    def __init__(self, limit=200, messages=()):
+        self._messages = deque(messages, maxlen=limit)
+
+    def __len__(self):
+        return len(self._messages)
+
+    @property
+    def limit(self):
+        return self._messages.maxlen
+
+    def append(self, role, content):
+        self._messages.append({"role": role, "content": content})
+
+    def messages(self):
+        return list(self._messages)
+
+    def page_count(self, page_size):
+        return max(1, -(-len(self._messages) // page_size))
+
+    def page(self, number, page_size):
+        # Messages of one page in chronological order
+        start = number * page_size
+        newest_first = list(islice(reversed(self._messages), start, start + page_size))
+        newest_first.reverse()
+        return newest_first
@@ -1,238 +1,196 @@
-crop_details= {
-    "Rice": {
-        "season": "Kharif (June–October)",
-        "states": "West Bengal, Uttar Pradesh, Punjab, Andhra Pradesh, Tamil Nadu"
-    },
-    "Maize": {
-        "season": "Kharif",
-        "states": "Karnataka, Andhra Pradesh, Madhya Pradesh"
-    },
-    "Millets": {
-        "season": "Kharif",
-        "states": "Rajasthan, Maharashtra, Karnataka"
-    },
-    "Cotton": {
-        "season": "Kharif",
-        "states": "Gujarat, Maharashtra, Andhra Pradesh, Telangana, Haryana"
-    },
-    "Sugarcane": {
-        "season": "Kharif",
-        "states": "Maharashtra, Karnataka, Tamil Nadu, Andhra Pradesh, Gujarat, Bihar, Haryana, Punjab"
-    },
-    "Pulses": {
-        "season": "Kharif",
-        "states": "Madhya Pradesh, Maharashtra"
-    },
-    "Wheat": {
-        "season": "Rabi (October–April)",
-        "states": "Uttar Pradesh, Punjab, Haryana, Madhya Pradesh, Rajasthan, Bihar, Gujarat"
-    },
-    "Barley": {
-        "season": "Rabi",
-        "states": "Rajasthan, Uttar Pradesh, Madhya Pradesh"
-    },
-    "Mustard": {
-        "season": "Rabi",
-        "states": "Rajasthan, Uttar Pradesh, Haryana"
-    },
-    "Gram (Chana)": {
-        "season": "Rabi",
-        "states": "Madhya Pradesh, Maharashtra, Rajasthan"
-    },
-    "Watermelon": {
-        "season": "Zaid (March–June)",
-        "states": "Various states during summer"
-    },
-    "Muskmelon": {
-        "season": "Zaid",
-        "states": "Various states"
-    },
-    "Cucumber": {
-        "season": "Zaid",
-        "states": "Regions with summer conditions"
-    },
-    "Tea": {
-        "season": "Cash Crop",
-        "states": "Assam, West Bengal, Tamil Nadu, Kerala"
-    },
-    "Coffee": {
-        "season": "Cash Crop",
-        "states": "Karnataka, Kerala, Tamil Nadu"
-    },
-    "Jute": {
-        "season": "Cash Crop",
-        "states": "West Bengal, Assam, Bihar"
-    },
-    "Oilseeds": {
-        "season": "Cash Crop",
-        "states": "Gujarat, Maharashtra, Madhya Pradesh"
-    },
-    "Potato": {
-        "season": "Horticultural Crop",
-        "states": "Uttar Pradesh, West Bengal"
-    },
-    "Onion": {
-        "season": "Horticultural Crop",
-        "states": "Maharashtra, Karnataka"
-    },
-    "Tomato": {
-        "season": "Horticultural Crop",
-        "states": "Andhra Pradesh, Madhya Pradesh"
-    },
-}
-state_based_crops = {
-    "West Bengal": ["Rice", "Jute", "Potato"],
-    "Uttar Pradesh": ["Wheat", "Sugarcane", "Rice"],
-    "Maharashtra": ["Cotton", "Sugarcane", "Onion"],
-    "Madhya Pradesh": ["Wheat", "Soybean", "Pulses"],
-    "Punjab": ["Rice", "Wheat", "Sugarcane"],
-    "Haryana": ["Wheat", "Cotton", "Mustard"],
-    "Rajasthan": ["Wheat", "Barley", "Mustard"],
-    "Karnataka": ["Maize", "Coffee", "Soybean"],
-    "Gujarat": ["Cotton", "Groundnut", "Sugarcane"],
-    "Tamil Nadu": ["Rice", "Sugarcane", "Cotton"],
-    # Add more states as needed
-}
-season_based_crops = {
-    "Kharif": {
-        "Rice": "West Bengal, Uttar Pradesh, Punjab, Andhra Pradesh, Tamil Nadu",
-        "Maize": "Karnataka, Andhra Pradesh, Madhya Pradesh",
-        "Millets (Bajra, Jowar, Ragi)": "Rajasthan, Maharashtra, Karnataka",
-        "Cotton": "Gujarat, Maharashtra, Andhra Pradesh, Telangana, Haryana",
-        "Sugarcane": "Maharashtra, Karnataka, Tamil Nadu, Andhra Pradesh, Gujarat, Bihar, Haryana, Punjab",
-        "Pulses (Moong, Urad)": "Madhya Pradesh, Maharashtra"
-    },
-    "Rabi": {
-        "Wheat": "Uttar Pradesh, Punjab, Haryana, Madhya Pradesh, Rajasthan, Bihar, Gujarat",
-        "Barley": "Rajasthan, Uttar Pradesh, Madhya Pradesh",
-        "Mustard": "Rajasthan, Uttar Pradesh, Haryana",
-        "Gram (Chana)": "Madhya Pradesh, Maharashtra, Rajasthan"
-    },
-    "Zaid": {
-        "Watermelon": "Various states during summer",
-        "Muskmelon": "Various states during summer",
-        "Cucumber": "Regions with summer conditions",
-        "Vegetables": "Quick-growing veggies planted in summer"
-    },
-    "Cash Crops": {
-        "Tea": "Assam, West Bengal, Tamil Nadu, Kerala",
-        "Coffee": "Karnataka, Kerala, Tamil Nadu",
-        "Jute": "West Bengal, Assam, Bihar",
-        "Oilseeds (Groundnut, Soybean, Sunflower)": "Gujarat, Maharashtra, Madhya Pradesh"
-    }
-}
-state_season_crop_map = {
-    "Maharashtra": {
-        "Kharif": ["Millets (Bajra, Jowar, Ragi)", "Cotton", "Sugarcane", "Pulses (Moong, Urad)"],
-        "Rabi": ["Gram (Chana)"],
-        "Zaid": ["Watermelon", "Muskmelon", "Vegetables"],
-        "Cash Crops": ["Oilseeds (Groundnut, Soybean, Sunflower)"]
-    },
-    "Uttar Pradesh": {
-        "Kharif": ["Rice"],
-        "Rabi": ["Wheat", "Barley", "Mustard"],
-        "Zaid": ["Vegetables"],
-        "Cash Crops": []
-    },
-    "Madhya Pradesh": {
-        "Kharif": ["Maize"],
-        "Rabi": ["Wheat", "Barley", "Gram (Chana)"],
-        "Zaid": ["Vegetables"],
-        "Cash Crops": ["Oilseeds (Soybean)"]
-    },
-    "Punjab": {
-        "Kharif": ["Rice", "Cotton"],
-        "Rabi": ["Wheat"],
-        "Zaid": [],
-        "Cash Crops": []
-    },
-    "Haryana": {
-        "Kharif": ["Cotton", "Rice", "Sugarcane"],
-        "Rabi": ["Wheat", "Mustard"],
-        "Zaid": [],
-        "Cash Crops": []
-    },
-    "Rajasthan": {
-        "Kharif": ["Millets", "Cotton"],
-        "Rabi": ["Barley", "Mustard", "Gram (Chana)"],
-        "Zaid": [],
-        "Cash Crops": []
-    },
-    "Andhra Pradesh": {
-        "Kharif": ["Rice", "Maize", "Cotton", "Sugarcane"],
-        "Rabi": [],
-        "Zaid": ["Vegetables"],
-        "Cash Crops": ["Oilseeds"]
-    },
-    "Karnataka": {
-        "Kharif": ["Maize", "Millets", "Sugarcane"],
-        "Rabi": [],
-        "Zaid": ["Vegetables"],
-        "Cash Crops": ["Coffee", "Oilseeds"]
-    },
-    "Tamil Nadu": {
-        "Kharif": ["Rice", "Sugarcane"],
-        "Rabi": [],
-        "Zaid": ["Watermelon", "Vegetables"],
-        "Cash Crops": ["Tea", "Coffee"]
-    },
-    "Gujarat": {
-        "Kharif": ["Cotton", "Groundnut"],
-        "Rabi": [],
-        "Zaid": [],
-        "Cash Crops": ["Oilseeds", "Sugarcane"]
-    },
-    "West Bengal": {
-        "Kharif": ["Rice", "Jute"],
-        "Rabi": [],
-        "Zaid": ["Vegetables"],
-        "Cash Crops": []
-    },
-    "Bihar": {
-        "Kharif": ["Sugarcane"],
-        "Rabi": ["Wheat"],
-        "Zaid": ["Vegetables"],
-        "Cash Crops": []
-    },
-    "Assam": {
-        "Kharif": ["Rice", "Jute"],
-        "Rabi": [],
-        "Zaid": [],
-        "Cash Crops": ["Tea"]
-    },
-    "Kerala": {
-        "Kharif": [],
-        "Rabi": [],
-        "Zaid": [],
-        "Cash Crops": ["Tea", "Coffee"]
-    },
-    "Himachal Pradesh": {
-        "Kharif": [],
-        "Rabi": [],
-        "Zaid": [],
-        "Cash Crops": ["Apple"]
-    },
-    "Jammu & Kashmir": {
-        "Kharif": [],
-        "Rabi": [],
-        "Zaid": [],
-        "Cash Crops": ["Apple"]
-    }
-}
-# yield_ranges.py
-
-crop_yield_ranges = {
-    "Rice": {"good": 3.5, "average": 2.0},     # tons/acre
-    "Wheat": {"good": 3.2, "average": 1.8},
-    "Maize": {"good": 3.0, "average": 1.7},
-    "Cotton": {"good": 1.8, "average": 1.0},
-    "Sugarcane": {"good": 40.0, "average": 25.0},
-    "Soybean": {"good": 2.5, "average": 1.2},
-    "Barley": {"good": 2.8, "average": 1.5},
-    "Mustard": {"good": 1.8, "average": 1.0},
-    "Gram": {"good": 1.6, "average": 0.8},
-    # Add more crops as needed
-}
+import threading
+import time
+import warnings
 
+import numpy as np
 
+from catalog_store import COMPILED_FILE, DATA_DIR, StateSeasonMap, open_catalog, split_states
 
+# Crop details, regional crops per season, yield ranges, name aliases and the
+# per-state and per-season crop lists live in data/*.csv and are compiled to
+# data/crop_catalog.bin on first use. States are decoded from it lazily, the
+# names below keep their old dict shapes.
+store = open_catalog()
+crop_details = store.crop_details
+state_season_crop_map = StateSeasonMap(store)
+crop_yield_ranges = store.crop_yield_ranges   # tons/acre
+CROP_ALIASES = store.aliases
+state_based_crops = store.state_based_crops
+season_based_crops = store.season_based_crops
+
+
+class CropCatalog:
+    # All crop reference data behind canonical names and indexes, so every
+    # lookup the app makes is a single dict access. Inconsistencies between the
+    # source tables are collected in self.issues while building. When the
+    # crop -> states index and the checks come precompiled (crop_states, issues),
+    # states are only read from state_season_crop_map the first time they are used.
+    def __init__(self, crop_details, state_season_crop_map, crop_yield_ranges,
+                 season_based_crops=None, state_based_crops=None, aliases=None,
+                 seasons=None, crop_states=None, issues=None, strict=False):
+        self.issues = list(issues or [])
+        precompiled = crop_states is not None
+        self._names = {}
+        for name in crop_details:
+            self._names[name.lower()] = name
+        for alias, name in (aliases or {}).items():
+            if name not in crop_details:
+                if not precompiled:
+                    self.issues.append(f"alias {alias!r} points to unknown crop {name!r}")
+                continue
+            self._names[alias.lower()] = name
+
+        self.crops = tuple(crop_details)
+        self.states = tuple(state_season_crop_map)
+        self._state_season_crop_map = state_season_crop_map
+        self._details = dict(crop_details)
+        self._crops_by_state_season = {}
+
+        unknown = set()
+        if precompiled:
+            self.seasons = tuple(seasons)
+            crop_states = {crop: dict.fromkeys(states) for crop, states in crop_states.items()}
+        else:
+            found_seasons = dict.fromkeys(seasons or ())
+            crop_states = {crop: dict.fromkeys(split_states(info["states"])) for crop, info in crop_details.items()}
+            for state, state_seasons in state_season_crop_map.items():
+                for season, raw_crops in state_seasons.items():
+                    found_seasons[season] = None
+                    for raw in raw_crops:
+                        crop = self.canonical(raw) or raw
+                        if crop not in crop_details:
+                            unknown.add(raw)
+                        crop_states.setdefault(crop, {})[state] = None
+            self.seasons = tuple(found_seasons)
+        for season, crops in (season_based_crops or {}).items():
+            for raw, states in crops.items():
+                crop = self.canonical(raw) or raw
+                if crop not in crop_details:
+                    unknown.add(raw)
+                crop_states.setdefault(crop, {}).update(dict.fromkeys(split_states(states)))
+        for state, crops in (state_based_crops or {}).items():
+            for raw in crops:
+                crop = self.canonical(raw) or raw
+                if crop not in crop_details:
+                    unknown.add(raw)
+                crop_states.setdefault(crop, {})[state] = None
+        if unknown:
+            source = "season_based_crops/state_based_crops" if precompiled else "the crop tables"
+            self.issues.append(f"crops in {source} missing from crop_details: {', '.join(sorted(unknown))}")
+        self._states_by_crop = {crop: tuple(states) for crop, states in crop_states.items()}
+
+        self._thresholds = {}
+        for raw, ranges in crop_yield_ranges.items():
+            crop = self.canonical(raw)
+            if crop is None:
+                if not precompiled:
+                    self.issues.append(f"yield ranges for unknown crop {raw!r}")
+                crop = raw
+            if ranges["good"] < ranges["average"] and not precompiled:
+                self.issues.append(f"yield ranges for {raw!r} have good below average")
+            self._thresholds[crop] = ranges
+        missing = [crop for crop in self.crops if crop not in self._thresholds]
+        if missing and not precompiled:
+            self.issues.append(f"crops without yield ranges: {', '.join(missing)}")
+
+        if self.issues:
+            if strict:
+                raise ValueError("inconsistent crop catalog:\n" + "\n".join(self.issues))
+            for issue in self.issues:
+                warnings.warn(f"crop catalog: {issue}", stacklevel=2)
+
+    @classmethod
+    def from_store(cls, store, **kwargs):
+        return cls(store.crop_details, StateSeasonMap(store), store.crop_yield_ranges,
+                   aliases=store.aliases, seasons=store.seasons, crop_states=store.crop_states,
+                   issues=store.issues, **kwargs)
+
+    def canonical(self, name):
+        return self._names.get(name.strip().lower())
+
+    def crops_for(self, state, season):
+        crops = self._crops_by_state_season.get((state, season))
+        if crops is None:
+            if state not in self._state_season_crop_map:
+                return ()
+            for name in self.seasons:
+                self._crops_by_state_season[state, name] = ()
+            for name, raw_crops in self._state_season_crop_map[state].items():
+                self._crops_by_state_season[state, name] = tuple(
+                    dict.fromkeys(self.canonical(raw) or raw for raw in raw_crops))
+            crops = self._crops_by_state_season.get((state, season), ())
+        return crops
+
+    def states_for(self, crop):
+        return self._states_by_crop.get(self.canonical(crop) or crop, ())
+
+    def details(self, crop):
+        return self._details.get(self.canonical(crop))
+
+    def thresholds(self, crop):
+        return self._thresholds.get(self.canonical(crop) or crop)
+
+    def yield_level(self, crop, value):
+        # "good", "average" or "poor" against crop_yield_ranges, None if unknown
+        ranges = self.thresholds(crop)
+        if ranges is None:
+            return None
+        if value >= ranges["good"]:
+            return "good"
+        if value >= ranges["average"]:
+            return "average"
+        return "poor"
+
+    def yield_levels(self, crops, values):
+        # Vectorized yield_level: an array of "good" / "average" / "poor", with
+        # None where a crop has no yield ranges. Ranges are looked up once per
+        # distinct crop name, not once per row.
+        names, codes = np.unique(np.asarray(crops, dtype=object).astype(str).ravel(), return_inverse=True)
+        ranges = [self.thresholds(name) for name in names]
+        good = np.array([r["good"] if r else np.nan for r in ranges], dtype=float)[codes]
+        average = np.array([r["average"] if r else np.nan for r in ranges], dtype=float)[codes]
+        values = np.asarray(values, dtype=float)
+        levels = np.select([values >= good, values >= average], ["good", "average"], "poor").astype(object)
+        levels[np.isnan(good)] = None
+        return levels
+
+
+catalog = CropCatalog.from_store(store)
+
+# Bumped whenever maybe_reload() rebuilds the catalog
+version = 1
+CHECK_INTERVAL = 1.0
+_next_check = 0.0
+_reload_lock = threading.Lock()
+
+
+def maybe_reload(path=COMPILED_FILE, data_dir=DATA_DIR):
+    # Recompiles and swaps in the catalog when a source CSV in data_dir changed,
+    # checked at most once per CHECK_INTERVAL seconds; returns version. Only
+    # code that reads crop_info.catalog on each use sees the new one, names
+    # imported with "from crop_info import catalog" keep the old one.
+    global store, crop_details, state_season_crop_map, crop_yield_ranges, CROP_ALIASES, catalog
+    global state_based_crops, season_based_crops
+    global version, _next_check
+    now = time.monotonic()
+    if now < _next_check:
+        return version
+    with _reload_lock:
+        if now < _next_check or store.is_current(data_dir):
+            _next_check = max(_next_check, now + CHECK_INTERVAL)
+            return version
+        _next_check = now + CHECK_INTERVAL
+        try:
+            new_store = open_catalog(path, data_dir)
+            new_catalog = CropCatalog.from_store(new_store)
+        except (OSError, ValueError, KeyError) as e:
+            # Keep serving the last good catalog
+            warnings.warn(f"could not reload the crop catalog: {e}")
+            return version
+        catalog = new_catalog
+        store, crop_details, crop_yield_ranges, CROP_ALIASES = (
+            new_store, new_store.crop_details, new_store.crop_yield_ranges, new_store.aliases)
+        state_season_crop_map = StateSeasonMap(new_store)
+        state_based_crops, season_based_crops = new_store.state_based_crops, new_store.season_based_crops
+        version += 1
+        return version
@@ -0,0 +1,256 @@
+# entities.py
+# Finds the states, districts, seasons and crops a chat message talks about,
+# tolerating typos ("maharastra", "kharrif", "channa"). The vocabulary comes from
+# the crop catalog; misspellings are looked up in a character n-gram index.
+import re
+
+import numpy as np
+
+import crop_info
+
+# Runs of anything but whitespace and punctuation. \w would split Devanagari
+# or Tamil words at their vowel signs, which are combining marks.
+_WORD = re.compile(r"[^\s\x00-\x2f\x3a-\x40\x5b-\x60\x7b-\x7f\u2000-\u206f\u0964\u0965]+")
+
+# Common words that sit within one edit of a catalog name ("what" / "wheat")
+# are only ever matched exactly
+STOPWORDS = {
+    "what", "which", "where", "when", "there", "their", "these", "those", "about", "should", "would",
+    "could", "grow", "grows", "grown", "plant", "plants", "crop", "crops", "season", "seasons", "state",
+    "states", "field", "farm", "best", "good", "with", "from", "this", "that", "have", "need", "needs",
+    "time", "tell", "please", "thank", "thanks", "hello", "sowing", "harvest", "price", "prices", "market",
+    "advice", "spice", "spices", "twice", "rate", "rates", "cost",
+}
+
+
+def words(text):
+    return _WORD.findall(text.casefold())
+
+
+def edit_distance(a, b, limit):
+    # Levenshtein distance, or limit + 1 as soon as it must exceed limit. Only
+    # the cells within limit of the diagonal can stay under it, so each row
+    # computes at most 2 * limit + 1 of them.
+    big = limit + 1
+    if abs(len(a) - len(b)) > limit:
+        return big
+    n = len(b)
+    previous = [j if j <= limit else big for j in range(n + 1)]
+    for i in range(1, len(a) + 1):
+        ca = a[i - 1]
+        current = [big] * (n + 1)
+        if i <= limit:
+            current[0] = i
+        row_min = current[0]
+        for j in range(max(1, i - limit), min(n, i + limit) + 1):
+            cost = previous[j - 1] + (ca != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > limit:
+            return big
+        previous = current
+    return min(previous[n], big)
+
+
+def max_typos(phrase):
+    # Edits allowed for a phrase of this length: short words must match exactly
+    if len(phrase) < 5:
+        return 0
+    if len(phrase) < 8:
+        return 1
+    return 2
+
+
+def bigrams(phrase):
+    padded = f"\0{phrase}\0"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+class NGramIndex:
+    # Character bigram index for approximate lookup. One edit changes at most
+    # two of a phrase's bigrams, so a name within k edits of the query shares at
+    # least max(bigrams in either) - 2k of them. Shared bigrams are counted for
+    # every name at once with a bincount over the query's posting lists, and
+    # only names over that bound get an exact edit distance. The edits allowed
+    # are capped by the name's own length too, so a short name like "rice" is
+    # never reached from a longer word like "price".
+    def __init__(self):
+        self._phrases = []
+        self._entities = []
+        self._ids = {}
+        self._postings = {}
+        self._frozen = None
+
+    def __len__(self):
+        return len(self._phrases)
+
+    def add(self, phrase, entity):
+        if phrase in self._ids:
+            return
+        self._ids[phrase] = len(self._phrases)
+        for gram in bigrams(phrase):
+            self._postings.setdefault(gram, []).append(len(self._phrases))
+        self._phrases.append(phrase)
+        self._entities.append(entity)
+        self._frozen = None
+
+    def _freeze(self):
+        # Posting lists as arrays, built on the first search after an add
+        postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in self._postings.items()}
+        lengths = np.array([len(phrase) for phrase in self._phrases])
+        grams = np.array([len(bigrams(phrase)) for phrase in self._phrases])
+        budgets = np.array([max_typos(phrase) for phrase in self._phrases])
+        self._frozen = (postings, lengths, grams, budgets)
+        return self._frozen
+
+    def search(self, phrase, limit):
+        # [(distance, phrase, entity), ...] within limit edits, and within the
+        # edits each name's own length allows, closest first
+        postings, lengths, grams, budgets = self._frozen or self._freeze()
+        query = bigrams(phrase)
+        lists = [postings[gram] for gram in query if gram in postings]
+        if not lists:
+            return []
+        shared = np.bincount(np.concatenate(lists), minlength=len(self._phrases))
+        limits = np.minimum(budgets, limit)
+        candidates = np.flatnonzero((limits > 0)
+                                    & (shared >= np.maximum(grams, len(query)) - 2 * limits)
+                                    & (np.abs(lengths - len(phrase)) <= limits))
+        found = []
+        for i in candidates.tolist():
+            d = edit_distance(phrase, self._phrases[i], int(limits[i]))
+            if d <= limits[i]:
+                found.append((d, self._phrases[i], self._entities[i]))
+        found.sort(key=lambda item: (item[0], item[1]))
+        return found
+
+
+class EntityExtractor:
+    # Vocabulary is {kind: {name: canonical}}, e.g. {"crop": {"Chana": "Gram (Chana)"}}.
+    # Names are indexed by their token form, so "Jammu & Kashmir" is
+    # "jammu kashmir" and multi-word names match across spacing and punctuation.
+    # A window of several words is only looked up when one of them is spelt like
+    # a distinctive word of a multi-word name ("pradesh", not "and").
+    def __init__(self, vocabulary, districts=None, stopwords=STOPWORDS, memo_size=32768):
+        self.stopwords = set(stopwords)
+        self.memo_size = memo_size
+        self._exact = {}
+        self._index = NGramIndex()
+        self._parts = set()
+        self._memo = {}
+        self.max_tokens = 1
+        for kind, names in vocabulary.items():
+            for name, canonical in names.items():
+                self._add(name, (kind, canonical))
+        # district -> state, so naming a district also sets the state
+        self._district_states = {}
+        for district, state in (districts or {}).items():
+            self._add(district, ("district", district))
+            self._district_states[district] = state
+
+    def _add(self, name, entity):
+        for spelling in {name, name.replace("&", " and ")}:
+            phrase = " ".join(words(spelling))
+            if not phrase:
+                continue
+            self._exact.setdefault(phrase, entity)
+            tokens = phrase.split(" ")
+            self.max_tokens = max(self.max_tokens, len(tokens))
+            if len(tokens) > 1:
+                self._parts.update(token for token in tokens if len(token) > 3 and token not in self.stopwords)
+            self._index.add(phrase, entity)
+
+    def __len__(self):
+        return len(self._exact)
+
+    def lookup(self, phrase):
+        # (kind, canonical) for one phrase, exact match first, else None
+        entity = self._exact.get(phrase)
+        if entity is not None or phrase in self.stopwords:
+            return entity
+        if phrase in self._memo:
+            return self._memo[phrase]
+        entity = self._fuzzy(phrase)
+        if len(self._memo) >= self.memo_size:
+            self._memo.clear()
+        self._memo[phrase] = entity
+        return entity
+
+    def _fuzzy(self, phrase):
+        # The budget here is the typed phrase's; search also caps it by each
+        # candidate name's length
+        tokens = phrase.split(" ")
+        limit = max_typos(phrase)
+        if not limit:
+            return None
+        if len(tokens) > 1 and not any(token in self._parts for token in tokens):
+            return None
+        found = self._index.search(phrase, limit)
+        if not found:
+            return None
+        # A tie between different entities is ambiguous, ignore the phrase
+        if len(found) > 1 and found[1][0] == found[0][0] and found[1][2] != found[0][2]:
+            return None
+        return found[0][2]
+
+    def extract(self, message):
+        # {kind: canonical} for the first state, district, season and crop
+        # named in the message
+        return {kind: value for kind, (value, _) in self.matches(message).items()}
+
+    def matches(self, message):
+        # {kind: (canonical, exact)}, like extract, with exact False for a name
+        # that was only found by its spelling; longer phrases win over the
+        # words inside them
+        tokens = words(message)
+        count = len(tokens)
+        # A window of several words can only be a name if one of them is part of
+        # one, so windows from i must reach the first such word at or after i
+        next_part = [count] * (count + 1)
+        for k in range(count - 1, -1, -1):
+            next_part[k] = k if tokens[k] in self._parts else next_part[k + 1]
+        entities = {}
+        i = 0
+        while i < count:
+            reach = min(self.max_tokens, count - i)
+            if next_part[i] - i >= reach:
+                sizes = (1,)
+            else:
+                sizes = [*range(reach, max(2, next_part[i] - i + 1) - 1, -1), 1]
+            for n in sizes:
+                phrase = " ".join(tokens[i:i + n])
+                entity = self.lookup(phrase)
+                if entity is not None:
+                    kind, value = entity
+                    exact = phrase in self._exact
+                    entities.setdefault(kind, (value, exact))
+                    if kind == "district":
+                        entities.setdefault("state", (self._district_states[value], exact))
+                    i += n
+                    break
+            else:
+                i += 1
+        return entities
+
+
+def catalog_vocabulary(catalog=None, aliases=None):
+    catalog = catalog or crop_info.catalog
+    aliases = crop_info.CROP_ALIASES if aliases is None else aliases
+    crops = {crop: crop for crop in catalog.crops}
+    crops.update({alias: crop for alias, crop in aliases.items() if crop in crops})
+    return {
+        "state": {state: state for state in catalog.states},
+        "season": {season: season for season in catalog.seasons},
+        "crop": crops,
+    }
+
+
+def catalog_districts(store=None):
+    store = store or crop_info.store
+    return {district: state for state in store.states for district in store.districts(state)}
+
@@ -0,0 +1,89 @@
+# images.py
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from crop_info import catalog
+
+IMAGE_DIR = os.environ.get(
+    "CROP_BOT_IMAGE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+DISPLAY_WIDTH = 300
+
+
+def build_manifest(image_dir=IMAGE_DIR):
+    # {canonical crop name: image path} from one scan of the image directory.
+    # File names are matched through the catalog aliases, so paddy.jpg or
+    # gram.png land on the right crop.
+    manifest = {}
+    if not os.path.isdir(image_dir):
+        return manifest
+    for entry in sorted(os.scandir(image_dir), key=lambda e: e.name):
+        stem, ext = os.path.splitext(entry.name)
+        if not entry.is_file() or ext.lower() not in IMAGE_EXTENSIONS:
+            continue
+        name = stem.replace("_", " ").replace("-", " ")
+        crop = catalog.canonical(name)
+        if crop is not None and crop not in manifest:
+            manifest[crop] = entry.path
+    return manifest
+
+
+def make_thumbnail(path, width=DISPLAY_WIDTH):
+    # Decode once and downscale to the display width. Images that are already
+    # small enough are served as they are, re-encoding them would only grow them.
+    with Image.open(path) as image:
+        if image.width <= width:
+            with open(path, "rb") as f:
+                return f.read()
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        out = io.BytesIO()
+        if image.mode == "RGBA":
+            image.save(out, format="PNG", optimize=True)
+        else:
+            image.save(out, format="JPEG", quality=85, optimize=True)
+        return out.getvalue()
+
+
+class ThumbnailCache:
+    # Crop images shared by every session: the manifest is built once and each
+    # thumbnail is decoded on first use, then served from an LRU capped in bytes
+    def __init__(self, manifest, max_bytes=8 * 1024 * 1024, width=DISPLAY_WIDTH):
+        self.manifest = manifest
+        self.max_bytes = max_bytes
+        self.width = width
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._thumbnails = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, crop):
+        # Thumbnail bytes for a crop, or None when there is no image for it
+        path = self.manifest.get(crop)
+        if path is None:
+            return None
+        with self._lock:
+            data = self._thumbnails.get(crop)
+            if data is not None:
+                self._thumbnails.move_to_end(crop)
+                self.hits += 1
+                return data
+            self.misses += 1
+        data = make_thumbnail(path, self.width)
+        with self._lock:
+            if crop not in self._thumbnails:
+                self._thumbnails[crop] = data
+                self.size_bytes += len(data)
+            while self.size_bytes > self.max_bytes and len(self._thumbnails) > 1:
+                _, evicted = self._thumbnails.popitem(last=False)
+                self.size_bytes -= len(evicted)
+        return data
+
+    def stats(self):
+        return {"size": len(self._thumbnails), "size_bytes": self.size_bytes, "hits": self.hits, "misses": self.misses}
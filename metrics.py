@@ -0,0 +1,109 @@
+# metrics.py
+import os
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+
+METRICS_FILE = os.environ.get("CROP_BOT_METRICS_FILE", "metrics.prom")
+WRITE_INTERVAL = 10  # seconds between Prometheus file writes
+FAILED_WRITE_INTERVAL = 300  # seconds to wait after the file could not be written
+
+
+class Metrics:
+    # Process-wide timings per page section plus plain counters. Recording a
+    # section is two perf_counter calls and a short lock, cheap enough to stay on.
+    def __init__(self, prefix="crop_bot"):
+        self.prefix = prefix
+        self.started = time.time()
+        self.sections = {}  # name -> [count, total seconds, last seconds, max seconds]
+        self.counters = {}
+        self._last_write = 0.0
+        self._write_failed = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def section(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        with self._lock:
+            stats = self.sections.get(name)
+            if stats is None:
+                self.sections[name] = [1, seconds, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = seconds
+                stats[3] = max(stats[3], seconds)
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            return {name: list(stats) for name, stats in self.sections.items()}, dict(self.counters)
+
+    def prometheus_text(self, gauges=None):
+        # Prometheus text exposition format; gauges is {name: value} for
+        # numbers owned elsewhere, such as cache statistics
+        sections, counters = self.snapshot()
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_section_seconds Time spent rendering each page section.",
+            f"# TYPE {p}_section_seconds summary",
+        ]
+        for name, (count, total, _, _) in sorted(sections.items()):
+            lines.append(f'{p}_section_seconds_sum{{section="{name}"}} {total:.6f}')
+            lines.append(f'{p}_section_seconds_count{{section="{name}"}} {count}')
+        lines.append(f"# TYPE {p}_section_seconds_max gauge")
+        for name, stats in sorted(sections.items()):
+            lines.append(f'{p}_section_seconds_max{{section="{name}"}} {stats[3]:.6f}')
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE {p}_{name}_total counter")
+            lines.append(f"{p}_{name}_total {value}")
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {p}_{name} gauge")
+            lines.append(f"{p}_{name} {value}")
+        lines.append(f"# TYPE {p}_start_time_seconds gauge")
+        lines.append(f"{p}_start_time_seconds {self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def maybe_write(self, path, gauges=None, interval=WRITE_INTERVAL):
+        # Rewrite the metrics file at most once per interval, atomically so a
+        # scraper never reads half a file. A file that cannot be written (say a
+        # read-only directory) is warned about once and retried only every
+        # FAILED_WRITE_INTERVAL; metrics never break the page.
+        if not path:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_write < (FAILED_WRITE_INTERVAL if self._write_failed else interval):
+                return False
+            self._last_write = now
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                f.write(self.prometheus_text(gauges))
+            os.replace(tmp, path)
+        except OSError as e:
+            if not self._write_failed:
+                warnings.warn(f"metrics: cannot write {path} ({e}), retrying every {FAILED_WRITE_INTERVAL} s")
+            self._write_failed = True
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return False
+        self._write_failed = False
+        return True
+
+
+# The app's metrics, one per process. Benchmarks that drive app.py through
+# AppTest run it in their own process and read its timings from here.
+app_metrics = Metrics()
@@ -1,10 +1,261 @@
 # model.py
+import json
+import os
+import threading
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+COEFFICIENTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "model_coefficients.json")
+
+
+class ModelRegistry:
+    # Per-crop (rainfall, temperature) coefficients loaded from a JSON file into
+    # one contiguous table; row 0 is the default for crops not listed. The file
+    # is checked for changes at most once per check_interval seconds and
+    # reloaded in place, so running sessions pick up new coefficients.
+    def __init__(self, path=COEFFICIENTS_FILE, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.version = 0
+        self._stamp = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        info = os.stat(self.path)
+        with open(self.path, encoding="utf-8") as f:
+            spec = json.load(f)
+        names = ["default"] + list(spec["crops"])
+        table = np.array(
+            [[spec["default"]["rainfall"], spec["default"]["temperature"]]]
+            + [[c["rainfall"], c["temperature"]] for c in spec["crops"].values()],
+            dtype=float,
+        )
+        index = {name.lower(): row for row, name in enumerate(names) if row}
+        for alias, name in spec.get("aliases", {}).items():
+            if name.lower() not in index:
+                raise ValueError(f"alias {alias!r} points to unknown crop {name!r}")
+            index[alias.lower()] = index[name.lower()]
+        # Swap everything in one assignment so readers never see a mix
+        self._model = (index, np.ascontiguousarray(table), float(spec.get("divisor", 1)))
+        self._stamp = (info.st_mtime_ns, info.st_size)
+        self.version += 1
+
+    def maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        with self._lock:
+            if now < self._next_check:
+                return False
+            self._next_check = now + self.check_interval
+            try:
+                info = os.stat(self.path)
+                if (info.st_mtime_ns, info.st_size) == self._stamp:
+                    return False
+                self._load()
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                # Keep serving the last good coefficients
+                warnings.warn(f"could not reload {self.path}: {e}")
+                return False
+        return True
+
+    def predict(self, crop, temperature, rainfall):
+        index, table, divisor = self._model
+        rain_coef, temp_coef = table[index.get(crop.lower(), 0)].tolist()
+        return round((rainfall * rain_coef + temperature * temp_coef) / divisor, 2)
+
+    def predict_batch(self, crops, temperatures, rainfalls):
+        index, table, divisor = self._model
+        # Resolve the table row once per distinct crop name instead of once per row
+        codes, names = pd.factorize(np.asarray(crops, dtype=object).ravel())
+        rows = np.array([index.get(name.lower(), 0) for name in names], dtype=np.intp)[codes]
+        coef = table[rows]
+        yields = rainfalls * coef[:, 0] + temperatures * coef[:, 1]
+        return _round_like_python(yields / divisor, 2)
+
+
+def _split(values):
+    # Veltkamp split of a float into two halves whose products are exact
+    c = 134217729.0 * values
+    high = c - (c - values)
+    return high, values - high
+
+
+def _round_like_python(values, ndigits):
+    # np.round scales by 10**ndigits before rounding, so it breaks ties on the
+    # rounded product (0.525 -> 0.52) where Python's round looks at the exact
+    # binary value (0.525 -> 0.53). Recover the product's rounding error with
+    # Dekker's exact multiplication and use its sign to settle the ties.
+    scale = 10.0 ** ndigits
+    scaled = values * scale
+    v_high, v_low = _split(values)
+    s_high, s_low = _split(np.float64(scale))
+    error = ((v_high * s_high - scaled) + v_high * s_low + v_low * s_high) + v_low * s_low
+    rounded = np.rint(scaled)
+    tie = np.abs(scaled - np.trunc(scaled)) == 0.5
+    rounded = np.where(tie & (error > 0), np.floor(scaled) + 1, rounded)
+    rounded = np.where(tie & (error < 0), np.floor(scaled), rounded)
+    return rounded / scale
+
+
+registry = ModelRegistry()
+
+
+def predict_yield_batch(crops, temperatures, rainfalls):
+    # Vectorized version of predict_yield: crops, temperatures and rainfalls are
+    # array-likes of the same length, returns a float array of yields
+    temperatures = np.atleast_1d(np.asarray(temperatures, dtype=float))
+    rainfalls = np.atleast_1d(np.asarray(rainfalls, dtype=float))
+    registry.maybe_reload()
+    return registry.predict_batch(crops, temperatures, rainfalls)
+
 
 def predict_yield(crop, temperature, rainfall):
-    # Simple dummy logic for now
-    if crop.lower() == "paddy":
-        return round((rainfall * 0.1 + temperature * 0.2) / 2, 2)
-    elif crop.lower() == "wheat":
-        return round((rainfall * 0.08 + temperature * 0.15) / 2, 2)
-    else:
-        return round((rainfall * 0.05 + temperature * 0.1) / 2, 2)
+    # Scalar entry point kept for the app; Python's round here is exactly what
+    # _round_like_python reproduces, so both paths give the same numbers
+    registry.maybe_reload()
+    return registry.predict(crop, temperature, rainfall)
+
+
+# Feature columns of the trained model, built from temperature t and rainfall r
+FEATURES = ("1", "t", "r", "t^2", "r^2", "t*r")
+MODEL_FILE = os.environ.get(
+    "CROP_BOT_MODEL_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "yield_model.npz")
+)
+
+
+def _design_matrix(temperatures, rainfalls):
+    t = np.asarray(temperatures, dtype=float).ravel()
+    r = np.asarray(rainfalls, dtype=float).ravel()
+    return np.column_stack([np.ones_like(t), t, r, t * t, r * r, t * r])
+
+
+class TrainedYieldModel:
+    # Per-crop least-squares regression on temperature and rainfall features,
+    # with a pooled fit over all crops (row 0) for crops it was not trained on
+    def __init__(self, crops, coefficients, metadata=None):
+        self.crops = tuple(crops)
+        self.coefficients = np.ascontiguousarray(coefficients, dtype=float)
+        self.metadata = metadata or {}
+        self._index = {crop.lower(): row for row, crop in enumerate(self.crops, start=1)}
+        self._rows = self.coefficients.tolist()
+
+    @classmethod
+    def fit(cls, crops, temperatures, rainfalls, yields, min_rows=20, ridge=1e-6):
+        crops = np.asarray(crops, dtype=object).ravel()
+        X = _design_matrix(temperatures, rainfalls)
+        y = np.asarray(yields, dtype=float).ravel()
+        # Scale the columns so the quadratic terms do not swamp the solve
+        scale = np.abs(X).max(axis=0)
+        scale[scale == 0] = 1
+
+        def solve(rows):
+            Xs = X[rows] / scale
+            A = Xs.T @ Xs + ridge * np.eye(Xs.shape[1])
+            return np.linalg.solve(A, Xs.T @ y[rows]) / scale
+
+        codes, names = pd.factorize(crops)
+        coefficients = [solve(np.arange(len(y)))]
+        trained, rows_per_crop = [], {}
+        for code, name in enumerate(names):
+            rows = np.flatnonzero(codes == code)
+            rows_per_crop[name] = int(len(rows))
+            if len(rows) >= min_rows:
+                trained.append(name)
+                coefficients.append(solve(rows))
+        metadata = {"rows": int(len(y)), "rows_per_crop": rows_per_crop, "features": list(FEATURES)}
+        return cls(trained, np.array(coefficients), metadata)
+
+    @classmethod
+    def load(cls, path=MODEL_FILE):
+        with np.load(path, allow_pickle=False) as artifact:
+            return cls(artifact["crops"].tolist(), artifact["coefficients"], json.loads(str(artifact["metadata"])))
+
+    def save(self, path=MODEL_FILE):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(f, crops=np.array(self.crops, dtype=str), coefficients=self.coefficients,
+                     metadata=np.array(json.dumps(self.metadata)))
+
+    def predict_batch(self, crops, temperatures, rainfalls):
+        codes, names = pd.factorize(np.asarray(crops, dtype=object).ravel())
+        rows = np.array([self._index.get(name.lower(), 0) for name in names], dtype=np.intp)[codes]
+        X = _design_matrix(temperatures, rainfalls)
+        coefficients = self.coefficients[rows]
+        yields = np.zeros(len(X))
+        for column in range(X.shape[1]):
+            yields = yields + X[:, column] * coefficients[:, column]
+        return _round_like_python(np.maximum(yields, 0), 2)
+
+    def predict(self, crop, temperature, rainfall):
+        # Same left-to-right arithmetic as predict_batch without the array overhead
+        t, r = float(temperature), float(rainfall)
+        yields = 0.0
+        for feature, coef in zip((1.0, t, r, t * t, r * r, t * r), self._rows[self._index.get(crop.lower(), 0)]):
+            yields = yields + feature * coef
+        return round(max(yields, 0.0), 2)
+
+
+class YieldSurface:
+    # Every yield answer on an integer temperature x rainfall grid, one 2D array
+    # per crop indexed as [temperature - t_min, rainfall - r_min]. Built from the
+    # trained model when one is given, otherwise from the coefficient registry,
+    # in which case the grids are rebuilt whenever the registry reloads.
+    def __init__(self, crops, temperature_range, rainfall_range, model=None):
+        self.crops = tuple(crops)
+        self.model = model
+        self.t_min, self.t_max = temperature_range
+        self.r_min, self.r_max = rainfall_range
+        self.temperatures = np.arange(self.t_min, self.t_max + 1)
+        self.rainfalls = np.arange(self.r_min, self.r_max + 1)
+        self.version = None
+        self.grids = {}
+        self._lock = threading.Lock()
+        self._refresh()
+
+    def _source(self):
+        if self.model is not None:
+            return self.model, "trained"
+        registry.maybe_reload()
+        return registry, registry.version
+
+    def _refresh(self):
+        source, version = self._source()
+        if self.version == version:
+            return
+        with self._lock:
+            if self.version == version:
+                return
+            t_grid, r_grid = np.meshgrid(self.temperatures, self.rainfalls, indexing="ij")
+            grids = {}
+            for crop in self.crops:
+                values = source.predict_batch(np.full(t_grid.size, crop, dtype=object),
+                                              t_grid.ravel().astype(float), r_grid.ravel().astype(float))
+                grids[crop] = values.reshape(t_grid.shape)
+            self.grids, self.version = grids, version
+
+    def lookup(self, crop, temperature, rainfall):
+        self._refresh()
+        grid = self.grids.get(crop)
+        in_range = self.t_min <= temperature <= self.t_max and self.r_min <= rainfall <= self.r_max
+        if grid is None or not in_range or temperature != int(temperature) or rainfall != int(rainfall):
+            return self._source()[0].predict(crop, temperature, rainfall)
+        return float(grid[int(temperature) - self.t_min, int(rainfall) - self.r_min])
+
+    def predict_batch(self, crops, temperature, rainfall):
+        # Several crops at one temperature and rainfall, in one vectorized call
+        self._refresh()
+        n = len(crops)
+        return self._source()[0].predict_batch(crops, np.full(n, float(temperature)), np.full(n, float(rainfall)))
+
+    def frame(self, crop, rainfall_step=1):
+        # Long-format table (temperature, rainfall, yield) for charting
+        self._refresh()
+        grid = self.grids[crop][:, ::rainfall_step]
+        t_grid, r_grid = np.meshgrid(self.temperatures, self.rainfalls[::rainfall_step], indexing="ij")
+        return pd.DataFrame({"temperature": t_grid.ravel(), "rainfall": r_grid.ravel(), "yield": grid.ravel()})
@@ -0,0 +1,216 @@
+# risk.py
+# Monte Carlo yield risk: instead of one temperature and one rainfall, draw many
+# seasons from a state's climate distribution and report how the yield is
+# distributed and how likely each crop_yield_ranges band is.
+#   python risk.py Punjab Rabi --crop Wheat
+#   python risk.py Maharashtra Kharif --scenarios 1000000 --workers 4
+#   python risk.py Punjab Rabi --climate observations.csv   # empirical samples
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import model
+from crop_info import catalog
+
+CLIMATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "climate_normals.csv")
+BATCH_SIZE = 65_536
+PERCENTILES = (5, 25, 50, 75, 95)
+LEVELS = ("good", "average", "poor")
+
+
+class NormalClimate:
+    # Temperature ~ normal, rainfall ~ gamma with the given mean and standard
+    # deviation, so rainfall is never negative and keeps its right skew
+    def __init__(self, temperature_mean, temperature_std, rainfall_mean, rainfall_std):
+        self.temperature_mean = temperature_mean
+        self.temperature_std = temperature_std
+        self.rainfall_mean = rainfall_mean
+        self.rainfall_std = rainfall_std
+
+    def draw(self, rng, n):
+        temperatures = rng.normal(self.temperature_mean, self.temperature_std, n)
+        if self.rainfall_std > 0 and self.rainfall_mean > 0:
+            shape = (self.rainfall_mean / self.rainfall_std) ** 2
+            rainfalls = rng.gamma(shape, self.rainfall_mean / shape, n)
+        else:
+            rainfalls = np.full(n, max(self.rainfall_mean, 0.0))
+        return temperatures, rainfalls
+
+
+class EmpiricalClimate:
+    # Observed (temperature, rainfall) pairs resampled with replacement, which
+    # keeps whatever correlation the observations have
+    def __init__(self, temperatures, rainfalls):
+        self.temperatures = np.asarray(temperatures, dtype=float)
+        self.rainfalls = np.asarray(rainfalls, dtype=float)
+
+    def draw(self, rng, n):
+        rows = rng.integers(0, len(self.temperatures), n)
+        return self.temperatures[rows], self.rainfalls[rows]
+
+
+def load_climates(path=CLIMATE_FILE):
+    # {(state, season): climate}. A file with temperature_mean/_std and
+    # rainfall_mean/_std columns gives NormalClimate rows; one with plain
+    # temperature and rainfall columns is a list of observations. An empty
+    # season is the state's whole-year climate.
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    climates = {}
+    if rows and "temperature_mean" in rows[0]:
+        for row in rows:
+            climates[row["state"], row["season"]] = NormalClimate(
+                float(row["temperature_mean"]), float(row["temperature_std"]),
+                float(row["rainfall_mean"]), float(row["rainfall_std"]),
+            )
+        return climates
+    samples = {}
+    for row in rows:
+        key = (row["state"], row.get("season", ""))
+        samples.setdefault(key, ([], []))
+        samples[key][0].append(float(row["temperature"]))
+        samples[key][1].append(float(row["rainfall"]))
+    return {key: EmpiricalClimate(t, r) for key, (t, r) in samples.items()}
+
+
+def climate_for(climates, state, season):
+    climate = climates.get((state, season)) or climates.get((state, ""))
+    if climate is None:
+        raise KeyError(f"no climate data for {state} ({season})")
+    return climate
+
+
+def _default_model():
+    model.registry.maybe_reload()
+    return model.registry
+
+
+def simulate_yields(crop, climate, scenarios=100_000, seed=0, yield_model=None, batch_size=BATCH_SIZE):
+    # Yields for `scenarios` draws, scored batch by batch. Each batch has its
+    # own generator spawned from the seed, so results do not depend on how the
+    # work is split up.
+    yield_model = yield_model or _default_model()
+    sizes = [batch_size] * (scenarios // batch_size)
+    if scenarios % batch_size:
+        sizes.append(scenarios % batch_size)
+    generators = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(len(sizes))]
+    yields = np.empty(scenarios)
+    start = 0
+    for rng, size in zip(generators, sizes):
+        temperatures, rainfalls = climate.draw(rng, size)
+        crops = np.full(size, crop, dtype=object)
+        yields[start:start + size] = yield_model.predict_batch(crops, temperatures, rainfalls)
+        start += size
+    return yields
+
+
+def summarize(crop, yields, bins=20):
+    # Distribution summary plus the probability of each yield band
+    counts, edges = np.histogram(yields, bins=bins)
+    summary = {
+        "crop": crop,
+        "scenarios": int(len(yields)),
+        "mean": float(yields.mean()),
+        "std": float(yields.std()),
+        "percentiles": dict(zip(PERCENTILES, np.percentile(yields, PERCENTILES).round(3).tolist())),
+        "histogram": {"edges": edges.round(3).tolist(), "counts": counts.tolist()},
+        "bands": None,
+    }
+    ranges = catalog.thresholds(crop)
+    if ranges is not None:
+        good = np.count_nonzero(yields >= ranges["good"])
+        average = np.count_nonzero(yields >= ranges["average"]) - good
+        summary["bands"] = {
+            "good": good / len(yields),
+            "average": average / len(yields),
+            "poor": 1 - (good + average) / len(yields),
+        }
+    return summary
+
+
+def simulate(crop, state, season, scenarios=100_000, seed=0, climates=None, yield_model=None):
+    if scenarios < 1:
+        raise ValueError(f"scenarios must be at least 1, got {scenarios}")
+    climate = climate_for(climates or load_climates(), state, season)
+    return summarize(crop, simulate_yields(crop, climate, scenarios, seed, yield_model))
+
+
+# Per worker process: the climate table and model are loaded once, not per crop
+_worker = {}
+
+
+def _init_worker(climate_file, model_file):
+    _worker["climates"] = load_climates(climate_file)
+    _worker["model"] = model.TrainedYieldModel.load(model_file) if model_file else None
+
+
+def _simulate_in_worker(crop, state, season, scenarios, seed):
+    return simulate(crop, state, season, scenarios, seed, _worker["climates"], _worker["model"])
+
+
+def simulate_state(state, season, scenarios=100_000, seed=0, workers=None, climate_file=CLIMATE_FILE,
+                   model_file=None, crops=None):
+    # One summary per crop grown in the state and season. Crops get seeds
+    # spawned from `seed` in catalog order, so the results are the same for any
+    # number of workers; workers=1 runs in this process.
+    if scenarios < 1:
+        raise ValueError(f"scenarios must be at least 1, got {scenarios}")
+    crops = list(crops or catalog.crops_for(state, season))
+    seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(len(crops))]
+    if workers == 1 or len(crops) < 2:
+        _init_worker(climate_file, model_file)
+        return [_simulate_in_worker(crop, state, season, scenarios, s) for crop, s in zip(crops, seeds)]
+    workers = min(workers or os.cpu_count() or 1, len(crops))
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(climate_file, model_file)) as pool:
+        futures = [pool.submit(_simulate_in_worker, crop, state, season, scenarios, s)
+                   for crop, s in zip(crops, seeds)]
+        return [future.result() for future in futures]
+
+
+def print_summaries(summaries):
+    print(f"{'crop':<14} {'mean':>7} {'std':>6} " + " ".join(f"{'p' + str(p):>6}" for p in PERCENTILES)
+          + "  " + " ".join(f"{level:>8}" for level in LEVELS))
+    for s in summaries:
+        bands = "  " + " ".join(
+            f"{s['bands'][level]:>8.1%}" if s["bands"] else f"{'-':>8}" for level in LEVELS)
+        print(f"{s['crop']:<14} {s['mean']:>7.2f} {s['std']:>6.2f} "
+              + " ".join(f"{s['percentiles'][p]:>6.2f}" for p in PERCENTILES) + bands)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo crop yield risk for a state and season")
+    parser.add_argument("state")
+    parser.add_argument("season")
+    parser.add_argument("--crop", action="append", help="crop to simulate (repeatable, default: all in season)")
+    parser.add_argument("--scenarios", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="processes (default: one per CPU, 1 = no pool)")
+    parser.add_argument("--climate", default=CLIMATE_FILE, help="climate normals or observations CSV")
+    parser.add_argument("--model", default=model.MODEL_FILE if os.path.exists(model.MODEL_FILE) else None,
+                        help="trained model artifact (default: the coefficient registry)")
+    args = parser.parse_args(argv)
+    if args.state not in catalog.states:
+        parser.error(f"unknown state {args.state!r}")
+    if args.scenarios < 1:
+        parser.error("--scenarios must be at least 1")
+    crops = [catalog.canonical(crop) or crop for crop in args.crop] if args.crop else None
+    start = time.perf_counter()
+    summaries = simulate_state(args.state, args.season, args.scenarios, args.seed, args.workers,
+                               args.climate, args.model, crops)
+    elapsed = time.perf_counter() - start
+    if not summaries:
+        print(f"no crops listed for {args.state} in {args.season}")
+        return 1
+    print_summaries(summaries)
+    total = args.scenarios * len(summaries)
+    print(f"{total:,} scenarios in {elapsed:.2f} s ({total / elapsed:,.0f}/s), seed {args.seed}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+# score_csv.py
+# Scores a large plot CSV (crop, temperature, rainfall and any other columns,
+# such as state) with the yield model and writes every row back with its
+# predicted yield and crop_yield_ranges level. The input is read in chunks of
+# lines and scored in worker processes, so memory stays bounded by the number
+# of chunks in flight; an interrupted run picks up after the last chunk written.
+#   python score_csv.py plots.csv scored.csv
+#   python score_csv.py plots.csv scored.parquet --workers 8 --chunk-rows 200000
+#   python score_csv.py --make-sample plots.csv --rows 1000000
+import argparse
+import collections
+import io
+import itertools
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import model
+from crop_info import catalog
+
+COLUMNS = ["crop", "temperature", "rainfall"]
+OUTPUT_COLUMNS = ["predicted_yield", "yield_level"]
+CHUNK_ROWS = 100_000
+
+
+def make_sample(path, rows, seed=0, chunk_rows=1_000_000):
+    # Synthetic plots for every state's crops, written a chunk at a time
+    rng = np.random.default_rng(seed)
+    pairs = [(state, crop) for state in catalog.states for season in catalog.seasons
+             for crop in catalog.crops_for(state, season)]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for start in range(0, rows, chunk_rows):
+            n = min(chunk_rows, rows - start)
+            picks = rng.integers(0, len(pairs), n)
+            frame = pd.DataFrame({
+                "plot_id": np.arange(start, start + n),
+                "state": [pairs[i][0] for i in picks],
+                "crop": [pairs[i][1] for i in picks],
+                "temperature": rng.uniform(10, 45, n).round(1),
+                "rainfall": rng.uniform(0, 300, n).round(1),
+            })
+            frame.to_csv(f, index=False, header=start == 0)
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS, offset=None):
+    # (header, lines, end offset) for each chunk of chunk_rows lines, as raw
+    # bytes so parsing happens in the workers, starting at byte offset (default:
+    # just after the header). Chunks are split on line breaks, so a quoted field
+    # must not contain one.
+    with open(path, "rb") as f:
+        header = f.readline()
+        if offset is not None:
+            f.seek(offset)
+        while True:
+            lines = list(itertools.islice(f, chunk_rows))
+            if not lines:
+                return
+            yield header, b"".join(lines), f.tell()
+
+
+def output_header(header):
+    columns = list(pd.read_csv(io.BytesIO(header), nrows=0).columns)
+    missing = [column for column in COLUMNS if column not in columns]
+    if missing:
+        raise ValueError(f"input has no {', '.join(missing)} column")
+    return columns + OUTPUT_COLUMNS
+
+
+def score_frame(frame, yield_model=None):
+    # The frame with predicted_yield and yield_level added. Rows with a missing
+    # or non-numeric temperature or rainfall get NaN and no level.
+    crops = frame["crop"].fillna("").astype(str).to_numpy(dtype=object)
+    temperatures = pd.to_numeric(frame["temperature"], errors="coerce").to_numpy(dtype=float)
+    rainfalls = pd.to_numeric(frame["rainfall"], errors="coerce").to_numpy(dtype=float)
+    if yield_model is None:
+        yields = model.predict_yield_batch(crops, temperatures, rainfalls)
+    else:
+        yields = yield_model.predict_batch(crops, temperatures, rainfalls)
+    levels = catalog.yield_levels(crops, yields)
+    levels[np.isnan(yields)] = None
+    return frame.assign(predicted_yield=yields, yield_level=levels)
+
+
+# Per worker process: the trained model is loaded once, not per chunk
+_worker = {}
+
+
+def _init_worker(model_file):
+    _worker["model"] = model.TrainedYieldModel.load(model_file) if model_file else None
+
+
+def _score_chunk(header, lines, fmt):
+    # (rows, unscored rows, encoded output). Every column is read as text so
+    # pass-through columns are written back exactly as they came in and each
+    # chunk has the same schema.
+    frame = pd.read_csv(io.BytesIO(header + lines), dtype=str, keep_default_na=False)
+    scored = score_frame(frame, _worker["model"])
+    unscored = int(scored["predicted_yield"].isna().sum())
+    if fmt == "parquet":
+        out = io.BytesIO()
+        scored.to_parquet(out, index=False)
+        return len(scored), unscored, out.getvalue()
+    return len(scored), unscored, scored.to_csv(index=False, header=False).encode("utf-8")
+
+
+def _scored_chunks(chunks, fmt, workers, model_file):
+    # (rows, unscored, payload, end offset) in input order. At most two chunks
+    # per worker are in flight, which is what bounds memory.
+    if workers == 1:
+        _init_worker(model_file)
+        for header, lines, end in chunks:
+            yield (*_score_chunk(header, lines, fmt), end)
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(model_file,)) as pool:
+        pending = collections.deque()
+        try:
+            for header, lines, end in chunks:
+                pending.append((pool.submit(_score_chunk, header, lines, fmt), end))
+                if len(pending) >= 2 * workers:
+                    future, done = pending.popleft()
+                    yield (*future.result(), done)
+            while pending:
+                future, done = pending.popleft()
+                yield (*future.result(), done)
+        finally:
+            for future, _ in pending:
+                future.cancel()
+
+
+class Checkpoint:
+    # Progress of one output file, saved next to it as <output>.progress.json
+    # after every chunk. It names the input by size and modification time, so a
+    # changed input starts over instead of resuming.
+    def __init__(self, output, source):
+        self.path = output + ".progress.json"
+        self.source = source
+        self.offset = None
+        self.chunks = 0
+        self.rows = 0
+        self.unscored = 0
+        self.output_bytes = 0
+        self.complete = False
+
+    @classmethod
+    def load(cls, output, source):
+        checkpoint = cls(output, source)
+        try:
+            with open(checkpoint.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if saved.get("source") != source:
+            return None
+        for name in ("offset", "chunks", "rows", "unscored", "output_bytes", "complete"):
+            setattr(checkpoint, name, saved[name])
+        return checkpoint
+
+    def save(self):
+        state = {name: getattr(self, name)
+                 for name in ("source", "offset", "chunks", "rows", "unscored", "output_bytes", "complete")}
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def input_source(path):
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class CsvSink:
+    # One CSV file. On resume everything after the checkpointed size is cut
+    # off, dropping a chunk that was half written when the run stopped.
+    def __init__(self, path, columns, checkpoint):
+        if checkpoint.chunks:
+            self.f = open(path, "r+b")
+            self.f.truncate(checkpoint.output_bytes)
+            self.f.seek(checkpoint.output_bytes)
+        else:
+            self.f = open(path, "wb")
+            self.f.write(pd.DataFrame(columns=columns).to_csv(index=False).encode("utf-8"))
+
+    def write(self, index, payload):
+        self.f.write(payload)
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        return self.f.tell()
+
+    def close(self):
+        self.f.close()
+
+
+class ParquetSink:
+    # A directory of part-NNNNN.parquet files, one per chunk, which
+    # pd.read_parquet reads as one table. Parts past the checkpoint are removed
+    # on resume.
+    def __init__(self, path, columns, checkpoint):
+        self.path = path
+        if not checkpoint.chunks and os.path.exists(path):
+            shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.startswith("part-") and int(name[5:10]) >= checkpoint.chunks:
+                os.remove(os.path.join(path, name))
+
+    def write(self, index, payload):
+        part = os.path.join(self.path, f"part-{index:05d}.parquet")
+        with open(part + ".tmp", "wb") as f:
+            f.write(payload)
+        os.replace(part + ".tmp", part)
+        return 0
+
+    def close(self):
+        pass
+
+
+def parquet_available():
+    try:
+        pd.io.parquet.get_engine("auto")
+    except ImportError:
+        return False
+    return True
+
+
+def score_file(input_path, output, chunk_rows=CHUNK_ROWS, workers=None, model_file=None, restart=False,
+               progress=None):
+    # Scores input_path into output (.parquet for Parquet, anything else for
+    # CSV) and returns the finished Checkpoint. Resumes from the checkpoint of
+    # an earlier run on the same input unless restart is set. progress, if
+    # given, is called as progress(checkpoint, fraction of input read).
+    fmt = "parquet" if output.endswith(".parquet") else "csv"
+    source = input_source(input_path)
+    checkpoint = None if restart else Checkpoint.load(output, source)
+    if checkpoint is not None and checkpoint.complete:
+        return checkpoint
+    if checkpoint is None or not os.path.exists(output):
+        checkpoint = Checkpoint(output, source)
+    with open(input_path, "rb") as f:
+        columns = output_header(f.readline())
+    workers = workers or os.cpu_count() or 1
+    sink = (ParquetSink if fmt == "parquet" else CsvSink)(output, columns, checkpoint)
+    try:
+        chunks = read_chunks(input_path, chunk_rows, checkpoint.offset)
+        for rows, unscored, payload, end in _scored_chunks(chunks, fmt, workers, model_file):
+            checkpoint.output_bytes = sink.write(checkpoint.chunks, payload)
+            checkpoint.offset = end
+            checkpoint.chunks += 1
+            checkpoint.rows += rows
+            checkpoint.unscored += unscored
+            checkpoint.save()
+            if progress:
+                progress(checkpoint, end / max(source["size"], 1))
+    finally:
+        sink.close()
+    checkpoint.complete = True
+    checkpoint.save()
+    return checkpoint
+
+
+def print_progress(started, resumed_rows):
+    def report(checkpoint, fraction):
+        elapsed = time.perf_counter() - started
+        rate = (checkpoint.rows - resumed_rows) / elapsed if elapsed else 0.0
+        eta = elapsed * (1 - fraction) / fraction if fraction else 0.0
+        print(f"\r{fraction:6.1%}  {checkpoint.rows:>13,} rows  {rate:>10,.0f} rows/s  eta {eta:>6.0f} s",
+              end="", file=sys.stderr, flush=True)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a large plot CSV with the crop yield model")
+    parser.add_argument("input", help=f"CSV with at least the columns {', '.join(COLUMNS)}")
+    parser.add_argument("output", nargs="?", help="scored CSV, or a .parquet directory of parts")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, help="processes (default: one per CPU, 1 = no pool)")
+    parser.add_argument("--model", default=model.MODEL_FILE if os.path.exists(model.MODEL_FILE) else None,
+                        help="trained model artifact (default: the coefficient registry)")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint of an earlier run")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress line")
+    parser.add_argument("--make-sample", action="store_true", help="write a synthetic plot CSV to input instead")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.make_sample:
+        make_sample(args.input, args.rows, args.seed)
+        print(f"wrote {args.rows:,} synthetic plots to {args.input}")
+        return 0
+    if not args.output:
+        parser.error("output is required")
+    if args.output.endswith(".parquet") and not parquet_available():
+        parser.error("Parquet output needs pyarrow or fastparquet (pip install pyarrow)")
+    with open(args.input, "rb") as f:
+        try:
+            output_header(f.readline())
+        except ValueError as e:
+            parser.error(str(e))
+    previous = Checkpoint.load(args.output, input_source(args.input)) if not args.restart else None
+    if previous is not None and previous.complete:
+        print(f"{args.output} is already complete ({previous.rows:,} rows), use --restart to score again")
+        return 0
+    resumed = previous.rows if previous is not None and os.path.exists(args.output) else 0
+    if resumed:
+        print(f"resuming after {resumed:,} rows")
+    start = time.perf_counter()
+    try:
+        checkpoint = score_file(args.input, args.output, args.chunk_rows, args.workers, args.model,
+                                args.restart, None if args.quiet else print_progress(start, resumed))
+    except KeyboardInterrupt:
+        saved = Checkpoint.load(args.output, input_source(args.input))
+        print(f"\ninterrupted after {saved.rows if saved else 0:,} rows, run the same command to resume",
+              file=sys.stderr)
+        return 130
+    elapsed = time.perf_counter() - start
+    if not args.quiet:
+        print(file=sys.stderr)
+    scored = checkpoint.rows - resumed
+    print(f"scored {scored:,} rows in {elapsed:.1f} s ({scored / elapsed:,.0f} rows/s), "
+          f"{checkpoint.rows:,} in {args.output}")
+    if checkpoint.unscored:
+        print(f"{checkpoint.unscored:,} rows had no numeric temperature or rainfall")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+# service.py
+# Headless JSON API over the same model, catalog and chatbot as app.py.
+# Run locally with: python service.py --port 8000
+import argparse
+import math
+import os
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from chat_backend import ChatBackend, make_responder
+from chatbot import ResponseCache, extractor, get_bot_response, matcher
+from crop_info import catalog
+from model import MODEL_FILE, TrainedYieldModel, predict_yield, predict_yield_batch
+
+# Batches larger than this are scored on a worker thread so they do not hold
+# up the event loop for other requests
+INLINE_BATCH_ROWS = 10_000
+MAX_BATCH_ROWS = 1_000_000
+
+
+def load_trained_model():
+    # Regression model from train_model.py, as app.py, risk.py and score_csv.py
+    # use it; without one the coefficient registry is used
+    if not os.path.exists(MODEL_FILE):
+        return None
+    return TrainedYieldModel.load(MODEL_FILE)
+
+
+trained_model = load_trained_model()
+response_cache = ResponseCache(maxsize=4096)
+chat_backend = ChatBackend(make_responder(cache=response_cache), cache=response_cache)
+
+
+class BadRequest(Exception):
+    pass
+
+
+async def read_json(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise BadRequest("request body must be JSON")
+    if not isinstance(body, dict):
+        raise BadRequest("request body must be a JSON object")
+    return body
+
+
+def is_number(value):
+    # JSON numbers only: not booleans or numeric strings, and not NaN or
+    # Infinity, which the JSON response could not carry back
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def field(body, name, kind):
+    value = body.get(name)
+    if kind is float and is_number(value):
+        return float(value)
+    if kind is str and isinstance(value, str) and value.strip():
+        return value
+    if kind is list and isinstance(value, list):
+        return value
+    raise BadRequest(f"{name!r} must be a {kind.__name__}")
+
+
+async def health(request):
+    return JSONResponse({"status": "ok", "crops": len(catalog.crops), "states": len(catalog.states)})
+
+
+async def predict(request):
+    body = await read_json(request)
+    crop = field(body, "crop", str)
+    temperature, rainfall = field(body, "temperature", float), field(body, "rainfall", float)
+    if trained_model is None:
+        result = predict_yield(crop, temperature, rainfall)
+    else:
+        result = trained_model.predict(crop, temperature, rainfall)
+    return JSONResponse({"crop": crop, "yield": result, "level": catalog.yield_level(crop, result)})
+
+
+def score_batch(crops, temperatures, rainfalls):
+    if trained_model is None:
+        yields = predict_yield_batch(crops, temperatures, rainfalls)
+    else:
+        yields = trained_model.predict_batch(crops, temperatures, rainfalls)
+    return {"yields": yields.tolist(), "levels": catalog.yield_levels(crops, yields).tolist()}
+
+
+async def predict_batch(request):
+    body = await read_json(request)
+    crops = field(body, "crops", list)
+    temperatures = field(body, "temperatures", list)
+    rainfalls = field(body, "rainfalls", list)
+    if not len(crops) == len(temperatures) == len(rainfalls):
+        raise BadRequest("'crops', 'temperatures' and 'rainfalls' must have the same length")
+    if len(crops) > MAX_BATCH_ROWS:
+        raise BadRequest(f"at most {MAX_BATCH_ROWS} rows per batch")
+    if not all(isinstance(crop, str) for crop in crops):
+        raise BadRequest("'crops' must be a list of strings")
+    if not all(map(is_number, temperatures)) or not all(map(is_number, rainfalls)):
+        raise BadRequest("'temperatures' and 'rainfalls' must be lists of numbers")
+    if len(crops) > INLINE_BATCH_ROWS:
+        result = await run_in_threadpool(score_batch, crops, temperatures, rainfalls)
+    else:
+        result = score_batch(crops, temperatures, rainfalls)
+    return JSONResponse(result)
+
+
+async def classify(request):
+    body = await read_json(request)
+    crop = field(body, "crop", str)
+    level = catalog.yield_level(crop, field(body, "yield", float))
+    if level is None:
+        return JSONResponse({"error": f"no yield ranges for {crop!r}"}, status_code=404)
+    return JSONResponse({"crop": crop, "level": level, "ranges": catalog.thresholds(crop)})
+
+
+def chat_request(body):
+    message = field(body, "message", str)
+    state = body.get("state", catalog.states[0])
+    season = body.get("season", catalog.seasons[0])
+    if state not in catalog.states or season not in catalog.seasons:
+        raise BadRequest("unknown 'state' or 'season'")
+    return message, state, season
+
+
+async def chat(request):
+    message, state, season = chat_request(await read_json(request))
+    return JSONResponse({
+        "reply": get_bot_response(message, state, season, cache=response_cache),
+        "intents": dict(matcher.match(message)),
+        "entities": extractor.extract(message),
+    })
+
+
+async def chat_stream(request):
+    # Reply tokens as plain text while they are generated; Starlette iterates
+    # the backend's generator on a worker thread
+    message, state, season = chat_request(await read_json(request))
+    return StreamingResponse(chat_backend.stream(message, state, season), media_type="text/plain; charset=utf-8")
+
+
+async def bad_request(request, exc):
+    return JSONResponse({"error": str(exc)}, status_code=400)
+
+
+app = Starlette(
+    routes=[
+        Route("/health", health),
+        Route("/predict", predict, methods=["POST"]),
+        Route("/predict/batch", predict_batch, methods=["POST"]),
+        Route("/classify", classify, methods=["POST"]),
+        Route("/chat", chat, methods=["POST"]),
+        Route("/chat/stream", chat_stream, methods=["POST"]),
+    ],
+    exception_handlers={BadRequest: bad_request},
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crop yield prediction and chat JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    uvicorn.run("service:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+# session_store.py
+# Per-user state (selections and chat history) kept outside the Streamlit
+# process, so it survives restarts and any replica can serve a returning user.
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SESSION_BACKEND = os.environ.get("CROP_BOT_SESSION_BACKEND", "sqlite")
+SESSION_PATH = os.environ.get("CROP_BOT_SESSION_PATH", "sessions.db")
+# Sessions not saved for this long are removed by the store's writer thread
+SESSION_TTL = float(os.environ.get("CROP_BOT_SESSION_TTL_DAYS", 30)) * 86400
+
+
+class SessionBackend:
+    # Storage interface: sessions are JSON-serializable dicts keyed by id
+    def load(self, session_id):
+        raise NotImplementedError
+
+    def save_many(self, sessions):
+        # {session_id: state}, written together where the backend allows it
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+    def prune(self, before):
+        # Removes sessions last saved before the time.time() value before,
+        # returns how many
+        raise NotImplementedError
+
+
+class SQLiteSessionBackend(SessionBackend):
+    def __init__(self, path=SESSION_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_many(self, sessions):
+        now = time.time()
+        rows = [(session_id, json.dumps(state), now) for session_id, state in sessions.items()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO sessions (id, data, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET data = excluded.data, updated = excluded.updated",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, session_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def prune(self, before):
+        with self._lock:
+            return self._conn.execute("DELETE FROM sessions WHERE updated < ?", (before,)).rowcount
+
+
+class FileSessionBackend(SessionBackend):
+    # One JSON file per session in a directory
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def load(self, session_id):
+        try:
+            with open(self._path(session_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save_many(self, sessions):
+        for session_id, state in sessions.items():
+            path = self._path(session_id)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp, path)
+
+    def delete(self, session_id):
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def prune(self, before):
+        removed = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.name.endswith(".json") and entry.stat().st_mtime < before:
+                        os.remove(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+class KeyValueSessionBackend(SessionBackend):
+    # Adapter for Redis-like clients: anything with get(key), set(key, value)
+    # and delete(key) works, and pipeline() is used for batches when present
+    def __init__(self, client, prefix="crop_bot:session:", ttl=None):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def load(self, session_id):
+        value = self.client.get(self.prefix + session_id)
+        return json.loads(value) if value else None
+
+    def save_many(self, sessions):
+        target = self.client.pipeline() if hasattr(self.client, "pipeline") else self.client
+        for session_id, state in sessions.items():
+            if self.ttl:
+                target.set(self.prefix + session_id, json.dumps(state), ex=self.ttl)
+            else:
+                target.set(self.prefix + session_id, json.dumps(state))
+        if target is not self.client:
+            target.execute()
+
+    def delete(self, session_id):
+        self.client.delete(self.prefix + session_id)
+
+    def prune(self, before):
+        # Expiry is left to the client, through ttl
+        return 0
+
+
+class InMemoryKeyValue:
+    # Process-local stand-in for a Redis client, for tests and local runs
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key)
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class SessionStore:
+    # Write-behind cache in front of a backend. save() only records the latest
+    # state in memory; a background thread writes all pending sessions in one
+    # batch every flush_interval seconds, so reruns never wait on storage.
+    # Each session is bounded to max_messages chat messages and max_bytes of JSON.
+    # The same thread removes sessions not saved for ttl seconds, checking every
+    # prune_interval seconds.
+    def __init__(self, backend, flush_interval=0.5, max_messages=200, max_bytes=64 * 1024,
+                 max_input_chars=2000, ttl=SESSION_TTL, prune_interval=3600):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.max_input_chars = max_input_chars
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self.writes = 0
+        self.flushes = 0
+        self.pruned = 0
+        self.errors = 0
+        self._next_prune = 0.0
+        self._pending = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="session-store-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def load(self, session_id):
+        with self._lock:
+            state = self._pending.get(session_id) or self._inflight.get(session_id)
+        if state is not None:
+            return state
+        return self.backend.load(session_id)
+
+    def bound(self, state):
+        # Keeps the newest max_messages messages, then drops the oldest two at a
+        # time until the JSON fits in max_bytes. Each message is measured once:
+        # a JSON list is its items joined by ", " between brackets.
+        chat = list(state.get("chat", []))[-self.max_messages:]
+        state = dict(state, chat=[])
+        last_input = state.get("last_chat_input")
+        if isinstance(last_input, str) and len(last_input) > self.max_input_chars:
+            state["last_chat_input"] = last_input[:self.max_input_chars]
+        sizes = [len(json.dumps(message)) + 2 for message in chat]
+        size = len(json.dumps(state)) + sum(sizes) - 2
+        start = 0
+        while start < len(chat) and size > self.max_bytes:
+            size -= sum(sizes[start:start + 2])
+            start += 2
+        state["chat"] = chat[start:]
+        return state
+
+    def save(self, session_id, state):
+        state = self.bound(state)
+        with self._lock:
+            self._pending[session_id] = state
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._inflight = batch
+        if not batch:
+            return 0
+        try:
+            self.backend.save_many(batch)
+        except Exception:
+            # Put the batch back unless newer states arrived meanwhile
+            self.errors += 1
+            with self._lock:
+                for session_id, state in batch.items():
+                    self._pending.setdefault(session_id, state)
+                self._inflight = {}
+            return 0
+        with self._lock:
+            self._inflight = {}
+        self.writes += len(batch)
+        self.flushes += 1
+        return len(batch)
+
+    def prune(self):
+        try:
+            removed = self.backend.prune(time.time() - self.ttl)
+        except Exception:
+            self.errors += 1
+            return 0
+        self.pruned += removed
+        return removed
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            if self.ttl and time.monotonic() >= self._next_prune:
+                self._next_prune = time.monotonic() + self.prune_interval
+                self.prune()
+
+    def close(self):
+        if self._stopped:
+            return
+        self._stopped = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {"pending": pending, "writes": self.writes, "flushes": self.flushes, "pruned": self.pruned,
+                "errors": self.errors}
+
+
+def make_backend(kind=SESSION_BACKEND, path=SESSION_PATH):
+    if kind == "sqlite":
+        return SQLiteSessionBackend(path)
+    if kind == "file":
+        return FileSessionBackend(path)
+    if kind == "memory":
+        return KeyValueSessionBackend(InMemoryKeyValue())
+    raise ValueError(f"unknown session backend {kind!r}, expected sqlite, file or memory")
@@ -0,0 +1,6 @@
+# Lets the tests import the top-level modules (model, chatbot, ...) when pytest
+# is run from anywhere
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,26 @@
+from benchmarks.run import compare, failures
+
+
+def results(**metrics):
+    return {"suites": {"load": metrics}}
+
+
+def test_slowdown_over_tolerance_is_flagged():
+    flagged = compare(results(p95_ms=130.0, rows_per_s=70.0), results(p95_ms=100.0, rows_per_s=100.0), 0.25)
+    assert [(metric, round(change, 2)) for _, metric, _, _, change in flagged] == [("p95_ms", 0.3), ("rows_per_s", 0.3)]
+
+
+def test_zero_baseline():
+    assert [m for _, m, *_ in compare(results(sessions_4_errors=1), results(sessions_4_errors=0), 0.25)] \
+        == ["sessions_4_errors"]
+    assert compare(results(sessions_4_errors=0), results(sessions_4_errors=0), 0.25) == []
+    assert compare(results(hits_per_s=5.0), results(hits_per_s=0), 0.25) == []
+
+
+def test_missing_baseline_metric_is_skipped():
+    assert compare(results(new_ms=1.0), results(), 0.25) == []
+
+
+def test_errors_fail_the_run():
+    assert failures(results(sessions_1_errors=0, p95_ms=10.0)) == []
+    assert failures(results(sessions_8_errors=2)) == [("load", "sessions_8_errors", 2)]
@@ -0,0 +1,54 @@
+import csv
+
+import pytest
+
+from catalog_store import SOURCES, CatalogStore, compile_catalog
+
+
+def write_sources(path, regions):
+    tables = {
+        "regions": (["state", "district", "season", "crop"], regions),
+        "details": (["crop", "season", "states"], [["Rice", "Kharif", "Punjab"]]),
+        "yield_ranges": (["crop", "good", "average"], [["Rice", "3.5", "2.0"]]),
+        "aliases": (["alias", "crop"], [["Paddy", "Rice"]]),
+        "state_crops": (["state", "crop"], [["Haryana", "Rice"]]),
+        "season_crops": (["season", "crop", "states"], [["Kharif", "Paddy", "Bihar, Assam"]]),
+    }
+    for name, (columns, rows) in tables.items():
+        with open(path / SOURCES[name], "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+
+
+def test_compiles_and_reads_back(tmp_path):
+    write_sources(tmp_path, [["Punjab", "", "Kharif", "Rice"], ["Punjab", "Ludhiana", "Rabi", "Paddy"]])
+    store = CatalogStore(data=compile_catalog(str(tmp_path)))
+    assert store.seasons == ("Kharif", "Rabi")
+    assert store.issues == []
+    assert store.state_based_crops == {"Haryana": ["Rice"]}
+    assert store.season_based_crops == {"Kharif": {"Paddy": "Bihar, Assam"}}
+    assert store.crop_states == {"Rice": ["Punjab", "Bihar", "Assam", "Haryana"]}
+
+
+def test_unknown_listed_crop_is_an_issue(tmp_path):
+    write_sources(tmp_path, [["Punjab", "", "Kharif", "Rice"]])
+    with open(tmp_path / SOURCES["state_crops"], "a", encoding="utf-8") as f:
+        f.write("Punjab,Kiwi\n")
+    store = CatalogStore(data=compile_catalog(str(tmp_path)))
+    assert store.issues == ["crops in season_crops.csv/state_crops.csv missing from crop_details: Kiwi"]
+
+
+def test_season_table_overflow_raises(tmp_path):
+    write_sources(tmp_path, [["Punjab", "", f"Season {i}", "Rice"] for i in range(256)])
+    compile_catalog(str(tmp_path))
+    write_sources(tmp_path, [["Punjab", "", f"Season {i}", "Rice"] for i in range(257)])
+    with pytest.raises(ValueError, match="257 distinct season values"):
+        compile_catalog(str(tmp_path))
+
+
+def test_district_table_overflow_raises(tmp_path):
+    # The empty district takes index 0
+    write_sources(tmp_path, [["Punjab", f"District {i}", "Kharif", "Rice"] for i in range(65536)])
+    with pytest.raises(ValueError, match="65,537 distinct district values"):
+        compile_catalog(str(tmp_path))
@@ -0,0 +1,80 @@
+import threading
+import time
+
+from chat_backend import ChatBackend, ScriptedResponder, ThreadedResponder
+
+
+def slow_generator(events, release):
+    def generate(message, state, season):
+        try:
+            yield "first "
+            events.append("step started")
+            release.wait(5)
+            events.append("step returned")
+            yield "late"
+        finally:
+            events.append(("closed", threading.current_thread() is threading.main_thread()))
+    return generate
+
+
+def test_scripted_reply_streams():
+    backend = ChatBackend(ScriptedResponder(reply="rice grows in kharif"))
+    try:
+        assert backend.reply("hi", "Punjab", "Kharif") == "rice grows in kharif"
+        assert backend.stats()["replies"] == 1
+    finally:
+        backend.close()
+
+
+def test_threaded_reply_runs_to_the_end():
+    backend = ChatBackend(ThreadedResponder(lambda message, state, season: iter(["a ", "b"])))
+    try:
+        assert backend.reply("hi", "Punjab", "Kharif") == "a b"
+    finally:
+        backend.close()
+
+
+def test_timed_out_step_holds_its_slot_until_it_returns():
+    events, release = [], threading.Event()
+    backend = ChatBackend(ThreadedResponder(slow_generator(events, release)), max_concurrent=1,
+                          first_token_timeout=0.2, reply_timeout=0.3)
+    try:
+        start = time.perf_counter()
+        assert backend.reply("hi", "Punjab", "Kharif") == "first …"
+        assert time.perf_counter() - start < 2
+        assert backend.stats()["truncated"] == 1
+        time.sleep(0.1)
+        # The blocked next() is still running, so the slot is still taken and
+        # the generator is not closed under it
+        assert backend.stats()["active"] == 1
+        assert events == ["step started"]
+        release.set()
+        for _ in range(100):
+            if backend.stats()["active"] == 0:
+                break
+            time.sleep(0.02)
+        assert backend.stats()["active"] == 0
+        assert events == ["step started", "step returned", ("closed", False)]
+    finally:
+        release.set()
+        backend.close()
+
+
+def test_abandoned_stream_closes_the_generator():
+    events, release = [], threading.Event()
+    backend = ChatBackend(ThreadedResponder(slow_generator(events, release)), first_token_timeout=5)
+    try:
+        stream = backend.stream("hi", "Punjab", "Kharif")
+        assert next(stream) == "first "
+        stream.close()
+        time.sleep(0.1)
+        release.set()
+        for _ in range(100):
+            if backend.stats()["active"] == 0:
+                break
+            time.sleep(0.02)
+        assert backend.stats()["active"] == 0
+        assert ("closed", False) in events
+    finally:
+        release.set()
+        backend.close()
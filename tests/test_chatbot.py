@@ -0,0 +1,56 @@
+import shutil
+
+import pytest
+
+import chatbot
+import crop_info
+from catalog_store import SOURCES, open_catalog
+from chatbot import ResponseCache, get_bot_response
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    # A private copy of the catalog sources, loaded as crop_info's catalog.
+    # Every global maybe_reload() swaps is restored afterwards.
+    for filename in SOURCES.values():
+        shutil.copy(f"{crop_info.DATA_DIR}/{filename}", tmp_path)
+    for name in ("store", "crop_details", "state_season_crop_map", "crop_yield_ranges", "CROP_ALIASES",
+                 "catalog", "version", "_next_check"):
+        monkeypatch.setattr(crop_info, name, getattr(crop_info, name))
+    monkeypatch.setattr(chatbot, "extractor", chatbot.extractor)
+    monkeypatch.setattr(chatbot, "_extractor_version", chatbot._extractor_version)
+    monkeypatch.setattr(crop_info, "store", open_catalog(str(tmp_path / "catalog.bin"), str(tmp_path)))
+    # Checked explicitly below, never by get_bot_response against data/
+    monkeypatch.setattr(crop_info, "CHECK_INTERVAL", 3600)
+    return tmp_path
+
+
+def reload(data_dir):
+    crop_info._next_check = 0.0
+    return crop_info.maybe_reload(str(data_dir / "catalog.bin"), str(data_dir))
+
+
+def test_cache_is_cleared_when_the_catalog_reloads(data_dir):
+    cache = ResponseCache()
+    assert reload(data_dir) == crop_info.version  # sources unchanged, nothing to do
+    before = get_bot_response("onion", "Punjab", "Kharif", cache=cache)
+    assert "Horticultural Crop" in before
+    assert get_bot_response("onion", "Punjab", "Kharif", cache=cache) == before
+    assert cache.stats()["hits"] == 1
+
+    details = data_dir / SOURCES["details"]
+    details.write_text(details.read_text(encoding="utf-8").replace(
+        "Onion,Horticultural Crop", "Onion,Rabi (November–May)"), encoding="utf-8")
+    version = crop_info.version
+    assert reload(data_dir) == version + 1
+    after = get_bot_response("onion", "Punjab", "Kharif", cache=cache)
+    assert "Rabi (November–May)" in after
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_broken_source_keeps_the_last_catalog(data_dir):
+    catalog = crop_info.catalog
+    (data_dir / SOURCES["yield_ranges"]).write_text("crop,good,average\nRice,high,2.0\n")
+    with pytest.warns(UserWarning, match="could not reload"):
+        reload(data_dir)
+    assert crop_info.catalog is catalog
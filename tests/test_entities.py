@@ -0,0 +1,58 @@
+import pytest
+
+from chatbot import extractor, get_bot_response, intent_table
+from entities import EntityExtractor, edit_distance
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("maharastra kharrif channa", {"state": "Maharashtra", "season": "Kharif", "crop": "Gram (Chana)"}),
+    ("rice in punjab", {"crop": "Rice", "state": "Punjab"}),
+    ("jammu & kashmir", {"state": "Jammu & Kashmir"}),
+])
+def test_extract(message, expected):
+    assert extractor.extract(message) == expected
+
+
+@pytest.mark.parametrize("message, crop", [
+    ("what is the price of wheat", "Wheat"),
+    ("about price of onion", "Onion"),
+    ("what is the market price of onion", "Onion"),
+])
+def test_longer_word_does_not_match_short_name(message, crop):
+    # "price" is one edit from "rice", but a 4-letter name only matches exactly
+    assert extractor.extract(message).get("crop") == crop
+
+
+def test_price_question_is_not_answered_about_rice():
+    assert not get_bot_response("what is the price of wheat", "Punjab", "Kharif").startswith("Rice")
+
+
+def test_typo_budget_is_capped_by_the_name():
+    ex = EntityExtractor({"crop": {"Rice": "Rice", "Barley": "Barley"}}, stopwords=())
+    assert ex.lookup("prices") is None
+    assert ex.lookup("barely") is None  # two edits, "barley" allows one
+    assert ex.lookup("barlei") == ("crop", "Barley")
+
+
+def test_edit_distance_limit():
+    assert edit_distance("kitten", "sitting", 3) == 3
+    assert edit_distance("kitten", "sitting", 2) == 3
+
+
+@pytest.mark.parametrize("message", [
+    "join the farmers union",   # union -> Onion
+    "don't cheat me",           # cheat -> Wheat
+    "custard recipe",           # custard -> Mustard
+    "barly",
+])
+def test_crop_found_by_spelling_alone_gets_no_crop_details(message):
+    assert get_bot_response(message, "Punjab", "Kharif") == intent_table["fallback"]
+
+
+def test_crop_named_exactly_gets_crop_details():
+    assert get_bot_response("onion", "Punjab", "Kharif").startswith("Onion")
+    assert get_bot_response("when to sow barly", "Punjab", "Kharif").startswith("Barley")
+
+
+def test_matches_marks_typos():
+    assert extractor.matches("punjab kharrif") == {"state": ("Punjab", True), "season": ("Kharif", False)}
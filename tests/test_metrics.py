@@ -0,0 +1,26 @@
+import warnings
+
+from metrics import Metrics
+
+
+def test_write(tmp_path):
+    metrics = Metrics()
+    metrics.observe("prediction", 0.5)
+    metrics.inc("predictions")
+    path = tmp_path / "metrics.prom"
+    assert metrics.maybe_write(str(path), {"cache_size": 3})
+    text = path.read_text()
+    assert 'crop_bot_section_seconds_count{section="prediction"} 1' in text
+    assert "crop_bot_predictions_total 1" in text
+    assert "crop_bot_cache_size 3" in text
+    assert not metrics.maybe_write(str(path))  # within the write interval
+
+
+def test_unwritable_path_warns_once(tmp_path):
+    metrics = Metrics()
+    path = str(tmp_path / "missing" / "metrics.prom")
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        assert not metrics.maybe_write(path, interval=0)
+        assert not metrics.maybe_write(path, interval=0)
+    assert len(caught) == 1
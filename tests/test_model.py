@@ -0,0 +1,101 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import model
+import train_model
+from model import TrainedYieldModel, _round_like_python
+
+SAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, "data", "sample_yields.csv")
+
+
+@pytest.fixture(scope="module")
+def sample():
+    return pd.read_csv(SAMPLE)
+
+
+@pytest.mark.parametrize("value", [0.525, 0.125, 2.675, 1.005, 0.015, 10.245, -0.525, 0.5, 3.0])
+def test_round_like_python_ties(value):
+    assert _round_like_python(np.array([value]), 2)[0] == round(value, 2)
+
+
+def test_round_like_python_random():
+    values = np.random.default_rng(0).uniform(-50, 50, 10_000).round(3)
+    expected = [round(v, 2) for v in values.tolist()]
+    assert _round_like_python(values, 2).tolist() == expected
+
+
+def test_predict_yield_batch_matches_scalar(sample):
+    crops = list(sample["crop"]) + ["unknown crop", "RICE"]
+    temperatures = list(sample["temperature"]) + [25.0, 30.0]
+    rainfalls = list(sample["rainfall"]) + [100.0, 150.0]
+    batch = model.predict_yield_batch(crops, temperatures, rainfalls)
+    assert batch.tolist() == [model.predict_yield(c, t, r) for c, t, r in zip(crops, temperatures, rainfalls)]
+
+
+def test_trained_batch_matches_scalar(sample):
+    trained = TrainedYieldModel.fit(sample["crop"], sample["temperature"], sample["rainfall"], sample["yield"])
+    crops = list(sample["crop"]) + ["unknown crop"]
+    temperatures = list(sample["temperature"]) + [25.0]
+    rainfalls = list(sample["rainfall"]) + [100.0]
+    batch = trained.predict_batch(crops, temperatures, rainfalls)
+    assert batch.tolist() == [trained.predict(c, t, r) for c, t, r in zip(crops, temperatures, rainfalls)]
+
+
+def test_train_save_load_round_trip(tmp_path):
+    data = tmp_path / "yields.csv"
+    output = tmp_path / "model.npz"
+    train_model.make_sample(500, seed=1).to_csv(data, index=False)
+    train_model.train(str(data), str(output), min_rows=5)
+    loaded = TrainedYieldModel.load(str(output))
+    assert loaded.metadata["rows"] == 500
+    assert loaded.metadata["source"] == str(data)
+
+    frame = pd.read_csv(data)
+    fitted = TrainedYieldModel.fit(frame["crop"], frame["temperature"], frame["rainfall"], frame["yield"],
+                                   min_rows=5)
+    assert loaded.crops == fitted.crops
+    np.testing.assert_array_equal(loaded.coefficients, fitted.coefficients)
+    assert loaded.predict_batch(frame["crop"], frame["temperature"], frame["rainfall"]).tolist() \
+        == fitted.predict_batch(frame["crop"], frame["temperature"], frame["rainfall"]).tolist()
+
+
+def write_coefficients(path, wheat_rainfall):
+    path.write_text(json.dumps({
+        "divisor": 2,
+        "default": {"rainfall": 0.05, "temperature": 0.1},
+        "crops": {"paddy": {"rainfall": 0.1, "temperature": 0.2},
+                  "wheat": {"rainfall": wheat_rainfall, "temperature": 0.15}},
+        "aliases": {"rice": "paddy"},
+    }))
+
+
+def test_registry_hot_reload(tmp_path):
+    path = tmp_path / "coefficients.json"
+    write_coefficients(path, 0.08)
+    registry = model.ModelRegistry(str(path), check_interval=0)
+    assert registry.predict("Wheat", 20, 100) == round((100 * 0.08 + 20 * 0.15) / 2, 2)
+    assert registry.predict("Rice", 20, 100) == registry.predict("paddy", 20, 100)
+    assert registry.predict("Unknown", 20, 100) == round((100 * 0.05 + 20 * 0.1) / 2, 2)
+
+    write_coefficients(path, 0.5)
+    assert registry.maybe_reload()
+    assert registry.version == 2
+    assert registry.predict("Wheat", 20, 100) == round((100 * 0.5 + 20 * 0.15) / 2, 2)
+    assert registry.predict_batch(["Wheat"], np.array([20.0]), np.array([100.0])).tolist() \
+        == [registry.predict("Wheat", 20, 100)]
+
+
+def test_registry_keeps_last_good_coefficients(tmp_path):
+    path = tmp_path / "coefficients.json"
+    write_coefficients(path, 0.08)
+    registry = model.ModelRegistry(str(path), check_interval=0)
+    before = registry.predict("Wheat", 20, 100)
+    path.write_text('{"divisor": 2, "crops": ')
+    with pytest.warns(UserWarning, match="could not reload"):
+        assert not registry.maybe_reload()
+    assert registry.predict("Wheat", 20, 100) == before
+    assert registry.version == 1
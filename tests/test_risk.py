@@ -0,0 +1,26 @@
+import pytest
+
+import risk
+
+
+def test_simulate_summarizes_every_scenario():
+    summary = risk.simulate("Wheat", "Punjab", "Rabi", scenarios=1000, seed=1)
+    assert summary["scenarios"] == 1000
+    assert sum(summary["histogram"]["counts"]) == 1000
+    assert summary == risk.simulate("Wheat", "Punjab", "Rabi", scenarios=1000, seed=1)
+
+
+@pytest.mark.parametrize("scenarios", [0, -5])
+def test_no_scenarios_is_rejected(scenarios):
+    with pytest.raises(ValueError, match="at least 1"):
+        risk.simulate("Wheat", "Punjab", "Rabi", scenarios=scenarios)
+    with pytest.raises(ValueError, match="at least 1"):
+        risk.simulate_state("Punjab", "Rabi", scenarios=scenarios, workers=1)
+
+
+@pytest.mark.parametrize("scenarios", ["0", "-5"])
+def test_cli_rejects_no_scenarios(scenarios, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        risk.main(["Punjab", "Rabi", "--scenarios", scenarios])
+    assert exit_info.value.code == 2
+    assert "--scenarios must be at least 1" in capsys.readouterr().err
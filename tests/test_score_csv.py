@@ -0,0 +1,65 @@
+import json
+
+import pandas as pd
+import pytest
+
+import score_csv
+
+
+class Interrupted(Exception):
+    pass
+
+
+def stop_after(chunks):
+    def progress(checkpoint, fraction):
+        if checkpoint.chunks == chunks:
+            raise Interrupted
+    return progress
+
+
+@pytest.fixture
+def plots(tmp_path):
+    path = tmp_path / "plots.csv"
+    score_csv.make_sample(str(path), 1000, seed=3)
+    return str(path)
+
+
+def test_scores_every_row(plots, tmp_path):
+    output = str(tmp_path / "scored.csv")
+    checkpoint = score_csv.score_file(plots, output, chunk_rows=300, workers=1)
+    scored = pd.read_csv(output)
+    assert checkpoint.complete and checkpoint.chunks == 4 and checkpoint.rows == len(scored) == 1000
+    assert list(scored.columns) == ["plot_id", "state", "crop", "temperature", "rainfall",
+                                    "predicted_yield", "yield_level"]
+
+
+def test_resume_matches_clean_run(plots, tmp_path):
+    clean = str(tmp_path / "clean.csv")
+    resumed = str(tmp_path / "resumed.csv")
+    score_csv.score_file(plots, clean, chunk_rows=150, workers=1)
+
+    with pytest.raises(Interrupted):
+        score_csv.score_file(plots, resumed, chunk_rows=150, workers=1, progress=stop_after(3))
+    with open(resumed + ".progress.json") as f:
+        saved = json.load(f)
+    assert saved["chunks"] == 3 and not saved["complete"]
+    # A chunk half written when the run stopped is cut off on resume
+    with open(resumed, "ab") as f:
+        f.write(b"999999,Punjab,Rice,2")
+
+    seen = []
+    checkpoint = score_csv.score_file(plots, resumed, chunk_rows=150, workers=1,
+                                      progress=lambda c, fraction: seen.append(c.chunks))
+    assert seen[0] == 4
+    assert checkpoint.complete and checkpoint.rows == 1000
+    with open(clean, "rb") as a, open(resumed, "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_changed_input_starts_over(plots, tmp_path):
+    output = str(tmp_path / "scored.csv")
+    with pytest.raises(Interrupted):
+        score_csv.score_file(plots, output, chunk_rows=300, workers=1, progress=stop_after(1))
+    score_csv.make_sample(plots, 600, seed=4)
+    checkpoint = score_csv.score_file(plots, output, chunk_rows=300, workers=1)
+    assert checkpoint.rows == len(pd.read_csv(output)) == 600
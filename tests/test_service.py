@@ -0,0 +1,75 @@
+import pytest
+
+pytest.importorskip("httpx")  # needed by Starlette's TestClient
+
+from starlette.testclient import TestClient  # noqa: E402
+
+import service  # noqa: E402
+import train_model  # noqa: E402
+from model import YieldSurface, predict_yield  # noqa: E402
+from service import app  # noqa: E402
+
+client = TestClient(app)
+
+
+def post_raw(path, body):
+    return client.post(path, content=body, headers={"content-type": "application/json"})
+
+
+def test_predict():
+    response = client.post("/predict", json={"crop": "Wheat", "temperature": 20, "rainfall": 100})
+    assert response.status_code == 200
+    assert response.json()["yield"] == predict_yield("Wheat", 20, 100)
+
+
+def test_predict_batch_matches_scalar():
+    body = {"crops": ["Wheat", "Rice", "Unknown"], "temperatures": [20, 30.5, 25], "rainfalls": [100, 200, 50]}
+    response = client.post("/predict/batch", json=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["yields"] == [predict_yield(*row) for row in zip(*body.values())]
+    assert result["levels"][2] is None
+
+
+@pytest.mark.parametrize("temperatures", [[None, 20], ["30", 20], [True, 20]])
+def test_predict_batch_rejects_non_numbers(temperatures):
+    body = {"crops": ["Wheat", "Rice"], "temperatures": temperatures, "rainfalls": [100, 100]}
+    assert client.post("/predict/batch", json=body).status_code == 400
+
+
+@pytest.mark.parametrize("value", ["NaN", "Infinity", "-Infinity"])
+def test_non_finite_numbers_are_rejected(value):
+    assert post_raw("/predict", '{"crop": "Wheat", "temperature": %s, "rainfall": 100}' % value).status_code == 400
+    body = '{"crops": ["Wheat"], "temperatures": [%s], "rainfalls": [100]}' % value
+    assert post_raw("/predict/batch", body).status_code == 400
+
+
+@pytest.fixture
+def trained(tmp_path, monkeypatch):
+    # A trained model file in place, loaded the way the service loads it
+    data, path = tmp_path / "yields.csv", tmp_path / "yield_model.npz"
+    train_model.make_sample(500, seed=2).to_csv(data, index=False)
+    train_model.train(str(data), str(path), min_rows=5)
+    monkeypatch.setattr(service, "MODEL_FILE", str(path))
+    monkeypatch.setattr(service, "trained_model", service.load_trained_model())
+    return service.trained_model
+
+
+def test_predict_matches_app_with_trained_model(trained):
+    # app.py answers from a YieldSurface over the same trained model
+    surface = YieldSurface(["Wheat", "Rice"], (10, 45), (0, 300), model=trained)
+    rows = [("Wheat", 20, 100), ("Rice", 30.5, 200), ("Rice", 44, 0), ("Unknown", 25, 50)]
+    for crop, temperature, rainfall in rows:
+        result = client.post("/predict", json={"crop": crop, "temperature": temperature, "rainfall": rainfall}).json()
+        assert result["yield"] == surface.lookup(crop, temperature, rainfall)
+        assert result["yield"] != predict_yield(crop, temperature, rainfall)
+    crops, temperatures, rainfalls = (list(column) for column in zip(*rows))
+    body = {"crops": crops, "temperatures": temperatures, "rainfalls": rainfalls}
+    result = client.post("/predict/batch", json=body).json()
+    assert result["yields"] == [surface.lookup(*row) for row in rows]
+    assert result["levels"] == [service.catalog.yield_level(crop, value) for crop, value in zip(crops, result["yields"])]
+
+
+def test_no_trained_model_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(service, "MODEL_FILE", str(tmp_path / "missing.npz"))
+    assert service.load_trained_model() is None
@@ -0,0 +1,75 @@
+import json
+import random
+import time
+
+import pytest
+
+from session_store import FileSessionBackend, InMemoryKeyValue, KeyValueSessionBackend, SessionStore, \
+    SQLiteSessionBackend
+
+
+def reference_bound(store, state):
+    # Drops two messages at a time and measures the whole state each time
+    chat = list(state.get("chat", []))[-store.max_messages:]
+    state = dict(state, chat=chat)
+    while chat and len(json.dumps(state)) > store.max_bytes:
+        chat = chat[2:]
+        state["chat"] = chat
+    return state
+
+
+@pytest.fixture
+def store():
+    store = SessionStore(KeyValueSessionBackend(InMemoryKeyValue()), max_messages=50, max_bytes=2000)
+    yield store
+    store.close()
+
+
+def test_bound_matches_reference(store):
+    rng = random.Random(0)
+    for _ in range(200):
+        chat = [{"role": rng.choice(["user", "bot"]), "content": "ज्वार" * rng.randint(0, 40) + "x" * rng.randint(0, 200)}
+                for _ in range(rng.randint(0, 80))]
+        state = {"selections": {"state": "Punjab"}, "chat": chat, "last_chat_input": "hi"}
+        bounded = store.bound(state)
+        assert bounded == reference_bound(store, state)
+        assert not bounded["chat"] or len(json.dumps(bounded)) <= store.max_bytes
+
+
+def test_bound_caps_last_chat_input(store):
+    bounded = store.bound({"chat": [], "last_chat_input": "x" * 10_000})
+    assert bounded["last_chat_input"] == "x" * store.max_input_chars
+    assert store.bound({"chat": []}) == {"chat": []}
+
+
+@pytest.mark.parametrize("make_backend", [
+    lambda path: SQLiteSessionBackend(str(path / "sessions.db")),
+    lambda path: FileSessionBackend(str(path / "sessions")),
+], ids=["sqlite", "file"])
+def test_prune_removes_stale_sessions(tmp_path, make_backend):
+    backend = make_backend(tmp_path)
+    backend.save_many({"old": {"chat": []}})
+    time.sleep(0.02)
+    cutoff = time.time()
+    time.sleep(0.02)
+    backend.save_many({"new": {"chat": []}})
+    assert backend.prune(cutoff) == 1
+    assert backend.load("old") is None
+    assert backend.load("new") == {"chat": []}
+
+
+def test_store_prunes_on_its_writer_thread(tmp_path):
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+    backend.save_many({"old": {"chat": []}})
+    store = SessionStore(backend, flush_interval=0.01, ttl=0.05)
+    try:
+        time.sleep(0.1)
+        store._next_prune = 0.0
+        for _ in range(100):
+            if store.stats()["pruned"]:
+                break
+            time.sleep(0.01)
+        assert store.stats()["pruned"] == 1
+        assert backend.load("old") is None
+    finally:
+        store.close()
@@ -0,0 +1,75 @@
+import datetime
+import threading
+
+import pytest
+
+import weather_store
+from weather_store import WeatherStore, season_windows
+
+DAY = datetime.date(2024, 7, 1)
+
+
+def test_season_windows():
+    assert season_windows(datetime.date(2024, 7, 1)) == [("Kharif", 2024)]
+    assert season_windows(datetime.date(2025, 1, 10)) == [("Rabi", 2024)]
+    assert season_windows(datetime.date(2024, 3, 15)) == [("Rabi", 2023), ("Zaid", 2024)]
+
+
+def test_running_aggregates(tmp_path):
+    with WeatherStore(str(tmp_path)) as store:
+        store.append("Punjab", DAY, 30, 10)
+        store.append("Punjab", DAY + datetime.timedelta(days=1), 20, 0)
+        assert store.append("Punjab", DAY, 99, 99) == 0  # already counted
+        f = store.features("Punjab", "Kharif")
+    assert f["days"] == 2
+    assert f["temperature"] == 25
+    assert f["rainfall_total"] == 10
+    assert f["degree_days"] == 30
+    assert (f["temperature_min"], f["temperature_max"]) == (20, 30)
+
+
+def test_reader_sees_writer(tmp_path):
+    writer = WeatherStore(str(tmp_path))
+    writer.append("Punjab", DAY, 30, 10)
+    writer.flush()
+    reader = WeatherStore(str(tmp_path), readonly=True)
+    writer.append("Bihar", DAY, 25, 5)
+    writer.flush()
+    assert reader.state_features("Bihar", "Kharif")["temperature"] == 25
+    with pytest.raises(FileNotFoundError):
+        WeatherStore(str(tmp_path / "missing"), readonly=True)
+
+
+def test_concurrent_refresh_keeps_rows_in_order(tmp_path):
+    writer = WeatherStore(str(tmp_path))
+    writer.append("base", DAY, 20, 1)
+    writer.flush()
+    reader = WeatherStore(str(tmp_path), readonly=True)
+    for i in range(400):
+        writer.append(f"loc{i}", DAY, i, 1)
+    writer.flush()
+    go = threading.Barrier(8)
+
+    def refresh():
+        go.wait()
+        reader.state_features("base", "Kharif")
+
+    threads = [threading.Thread(target=refresh) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [reader.features(f"loc{i}", "Kharif")["temperature"] for i in range(400)] == list(range(400))
+
+
+def test_shared_store_is_opened_once(tmp_path, monkeypatch):
+    path = str(tmp_path / "store")
+    monkeypatch.setattr(weather_store, "_shared", {})
+    with pytest.raises(FileNotFoundError):
+        weather_store.shared_store(path)
+    with WeatherStore(path) as writer:
+        writer.append("Punjab", DAY, 30, 100)
+    store = weather_store.shared_store(path)
+    assert weather_store.shared_store(path) is store
+    assert store.features("Punjab", "Kharif")["days"] == 1
+    store.close()
@@ -0,0 +1,75 @@
+# train_model.py
+# Fits the regression yield model on a historical yield CSV and saves it for
+# app.py, which loads it once per server process.
+#   python train_model.py data/sample_yields.csv
+#   python train_model.py --make-sample data/sample_yields.csv --rows 5000
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from crop_info import catalog
+from model import MODEL_FILE, TrainedYieldModel
+
+COLUMNS = ["crop", "temperature", "rainfall", "yield"]
+
+
+def make_sample(rows, seed=0):
+    # Synthetic history: each crop has an ideal temperature and rainfall and
+    # loses yield quadratically away from them, plus noise
+    rng = np.random.default_rng(seed)
+    crops = list(catalog.crops)
+    profiles = {
+        crop: (rng.uniform(18, 32), rng.uniform(60, 220), rng.uniform(1.0, 4.0))
+        for crop in crops
+    }
+    profiles["Sugarcane"] = (30.0, 200.0, 35.0)
+    crop = rng.choice(crops, size=rows)
+    temperature = rng.uniform(10, 45, size=rows).round(1)
+    rainfall = rng.uniform(0, 300, size=rows).round(1)
+    best_t, best_r, peak = (np.array([profiles[c][i] for c in crop]) for i in range(3))
+    loss = ((temperature - best_t) / 20) ** 2 + ((rainfall - best_r) / 200) ** 2
+    noise = rng.normal(0, 0.05, size=rows)
+    yields = np.maximum(peak * (1 - loss + noise), 0).round(2)
+    return pd.DataFrame({"crop": crop, "temperature": temperature, "rainfall": rainfall, "yield": yields})
+
+
+def train(path, output, min_rows):
+    frame = pd.read_csv(path, usecols=COLUMNS)
+    frame = frame.dropna()
+    start = time.perf_counter()
+    model = TrainedYieldModel.fit(frame["crop"], frame["temperature"], frame["rainfall"], frame["yield"],
+                                  min_rows=min_rows)
+    elapsed = time.perf_counter() - start
+    predicted = model.predict_batch(frame["crop"], frame["temperature"], frame["rainfall"])
+    rmse = float(np.sqrt(np.mean((predicted - frame["yield"].to_numpy()) ** 2)))
+    model.metadata.update({"source": path, "rmse": rmse})
+    model.save(output)
+    print(f"trained on {len(frame):,} rows in {elapsed * 1000:.1f} ms, {len(model.crops)} crops, rmse {rmse:.3f}")
+    skipped = [crop for crop, n in model.metadata["rows_per_crop"].items() if crop not in model.crops]
+    if skipped:
+        print(f"fewer than {min_rows} rows, using the pooled fit for: {', '.join(skipped)}")
+    print(f"saved {output}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the crop yield regression model")
+    parser.add_argument("csv", help=f"yield history with columns {', '.join(COLUMNS)}")
+    parser.add_argument("-o", "--output", default=MODEL_FILE)
+    parser.add_argument("--min-rows", type=int, default=20, help="rows needed to fit a crop on its own")
+    parser.add_argument("--make-sample", action="store_true", help="write a synthetic dataset to CSV instead")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.make_sample:
+        make_sample(args.rows, args.seed).to_csv(args.csv, index=False)
+        print(f"wrote {args.rows:,} synthetic rows to {args.csv}")
+        return 0
+    train(args.csv, args.output, args.min_rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+# weather_store.py
+# Daily weather per state or district, kept as running seasonal aggregates so
+# the yield model can be fed observed weather instead of slider values. Each
+# (location, season, year) window is one row of a memory-mapped float array:
+# appending a day updates the rows of the windows it falls in, and reading
+# features is one row lookup, never a scan of the history.
+#   python weather_store.py daily.csv                 # ingest location,date,temperature,rainfall
+#   python weather_store.py --show Punjab             # aggregates per season and year
+#   python weather_store.py --make-sample daily.csv --start 2024-01-01 --days 730
+#
+# Store layout (a directory):
+#   index.jsonl     a header line, then one line per window in row order
+#   aggregates.f8   float64 rows of len(FIELDS), grown in place as windows are added
+# One process writes; any number of readers pick up new days and windows on
+# refresh(). A store object may be shared by threads, e.g. Streamlit sessions.
+import argparse
+import csv
+import datetime
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+import crop_info
+import model
+import risk
+
+STORE_DIR = os.environ.get(
+    "CROP_BOT_WEATHER_STORE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "weather_store")
+)
+INDEX_FILE = "index.jsonl"
+DATA_FILE = "aggregates.f8"
+VERSION = 1
+
+# Sowing-to-harvest windows as (month, day) bounds, inclusive. Rabi runs over
+# the new year and belongs to the year it starts in; windows may overlap, a day
+# counts towards every window it falls in.
+SEASON_WINDOWS = {
+    "Kharif": ((6, 1), (10, 31)),
+    "Rabi": ((11, 1), (3, 31)),
+    "Zaid": ((3, 1), (6, 30)),
+}
+
+# Columns of a window's row
+FIELDS = ("days", "last_day", "temperature_sum", "rainfall_sum", "degree_days", "temperature_min", "temperature_max")
+DAYS, LAST_DAY, TEMPERATURE_SUM, RAINFALL_SUM, DEGREE_DAYS, TEMPERATURE_MIN, TEMPERATURE_MAX = range(len(FIELDS))
+
+# The model's rainfall input is on the scale of the slider and of
+# climate_normals.csv, a month's rainfall, so the store feeds it the season's
+# rainfall per this many days
+RAINFALL_PERIOD_DAYS = 30.4
+
+
+def season_windows(day):
+    # [(season, year), ...] for the windows containing this date
+    found = []
+    key = (day.month, day.day)
+    for season, (start, end) in SEASON_WINDOWS.items():
+        if start <= end:
+            if start <= key <= end:
+                found.append((season, day.year))
+        elif key >= start:
+            found.append((season, day.year))
+        elif key <= end:
+            found.append((season, day.year - 1))
+    return found
+
+
+class WeatherStore:
+    # Opens the store at path, creating it if needed. Degree-days are summed
+    # above base_temperature, which is fixed when the store is created.
+    def __init__(self, path=STORE_DIR, base_temperature=10.0, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        index_path = os.path.join(path, INDEX_FILE)
+        if not os.path.exists(index_path):
+            if readonly:
+                raise FileNotFoundError(f"no weather store at {path}")
+            os.makedirs(path, exist_ok=True)
+            with open(index_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"version": VERSION, "fields": FIELDS, "base_temperature": base_temperature}) + "\n")
+            open(os.path.join(path, DATA_FILE), "wb").close()
+        self._index = open(index_path, "r" if readonly else "r+", encoding="utf-8")
+        header = json.loads(self._index.readline())
+        if header.get("version") != VERSION or tuple(header.get("fields", ())) != FIELDS:
+            raise ValueError(f"{path} is not a version {VERSION} weather store")
+        self.base_temperature = header["base_temperature"]
+        self._rows = {}
+        self._latest = {}
+        self._windows = 0
+        self._mapping = self._data = None
+        self._stamp = None
+        # Guards the index position, the window maps and the mapping, which
+        # refresh() changes while other threads read features
+        self._lock = threading.RLock()
+        self.refresh()
+
+    def refresh(self):
+        # Picks up windows and rows added by a writer process since the last
+        # call: reads only the new index lines and remaps if the file grew
+        with self._lock:
+            while True:
+                position = self._index.tell()
+                line = self._index.readline()
+                if not line.endswith("\n"):
+                    # Nothing new, or a line the writer has not finished
+                    self._index.seek(position)
+                    break
+                location, season, year = json.loads(line)
+                self._remember(location, season, year)
+            stat = os.stat(os.path.join(self.path, DATA_FILE))
+            if (stat.st_ino, stat.st_size) != self._stamp:
+                self._map(stat.st_size // (8 * len(FIELDS)))
+
+    def _remember(self, location, season, year):
+        # A window's row is its line number in the index
+        self._rows[location, season, year] = self._windows
+        self._windows += 1
+        if year > self._latest.get((location, season), -math.inf):
+            self._latest[location, season] = year
+
+    def _map(self, capacity):
+        data_path = os.path.join(self.path, DATA_FILE)
+        self.flush()
+        self._mapping = self._data = None
+        if capacity:
+            self._mapping = np.memmap(data_path, dtype=np.float64, mode="r" if self.readonly else "r+",
+                                      shape=(capacity, len(FIELDS)))
+            # Rows are read and written through a plain ndarray over the same
+            # memory, which skips np.memmap's per-access overhead
+            self._data = self._mapping.view(np.ndarray)
+        stat = os.stat(data_path)
+        self._stamp = (stat.st_ino, stat.st_size)
+
+    def _add_window(self, location, season, year):
+        # New row at the end, growing the file in place by doubling so adding
+        # windows stays O(1) amortized
+        row = self._windows
+        capacity = 0 if self._data is None else len(self._data)
+        if row >= capacity:
+            with open(os.path.join(self.path, DATA_FILE), "r+b") as f:
+                f.truncate(max(2 * capacity, 64) * 8 * len(FIELDS))
+            self._map(max(2 * capacity, 64))
+        self._data[row] = (0, -math.inf, 0, 0, 0, math.inf, -math.inf)
+        self._index.seek(0, os.SEEK_END)
+        self._index.write(json.dumps([location, season, year]) + "\n")
+        self._index.flush()
+        self._remember(location, season, year)
+        return row
+
+    def append(self, location, day, temperature, rainfall):
+        # Adds one day's mean temperature (°C) and rainfall (mm) to every window
+        # it falls in and returns how many it updated. Days must arrive in date
+        # order per location; a day already counted is skipped.
+        ordinal = day.toordinal()
+        temperature = float(temperature)
+        rainfall = float(rainfall)
+        updated = 0
+        for season, year in season_windows(day):
+            row = self._rows.get((location, season, year))
+            if row is None:
+                row = self._add_window(location, season, year)
+            days, last_day, t_sum, r_sum, degree_days, t_min, t_max = self._data[row].tolist()
+            if last_day >= ordinal:
+                continue
+            self._data[row] = (days + 1, ordinal, t_sum + temperature, r_sum + rainfall,
+                               degree_days + max(temperature - self.base_temperature, 0.0),
+                               min(t_min, temperature), max(t_max, temperature))
+            updated += 1
+        return updated
+
+    def ingest(self, days):
+        # days: iterable of (location, date, temperature, rainfall); returns the
+        # number of window updates
+        updated = sum(self.append(*day) for day in days)
+        self.flush()
+        return updated
+
+    def windows(self, location):
+        with self._lock:
+            return sorted((season, year) for (name, season, year) in self._rows if name == location)
+
+    @property
+    def locations(self):
+        with self._lock:
+            return sorted({location for location, _, _ in self._rows})
+
+    def features(self, location, season, year=None):
+        # Aggregates of one window (the latest year by default) as model inputs,
+        # or None when the store has no days for it
+        with self._lock:
+            if year is None:
+                year = self._latest.get((location, season))
+            row = self._rows.get((location, season, year))
+            if row is None or self._data is None:
+                return None
+            values = self._data[row].tolist()
+        days = values[DAYS]
+        if not days:
+            return None
+        return {
+            "location": location,
+            "season": season,
+            "year": year,
+            "days": int(days),
+            "last_date": datetime.date.fromordinal(int(values[LAST_DAY])),
+            "temperature": round(values[TEMPERATURE_SUM] / days, 2),
+            "rainfall": round(values[RAINFALL_SUM] / days * RAINFALL_PERIOD_DAYS, 2),
+            "rainfall_total": round(values[RAINFALL_SUM], 2),
+            "degree_days": round(values[DEGREE_DAYS], 2),
+            "temperature_min": values[TEMPERATURE_MIN],
+            "temperature_max": values[TEMPERATURE_MAX],
+        }
+
+    def state_features(self, state, season, year=None, districts=None):
+        # The state's own series if it has one, else the mean over whichever of
+        # its districts (from the crop catalog by default) have data for the window
+        self.refresh()
+        features = self.features(state, season, year)
+        if features is not None:
+            return features
+        if districts is None:
+            districts = crop_info.store.districts(state) if state in crop_info.store.states else ()
+        found = [f for f in (self.features(district, season, year) for district in districts) if f]
+        if not found:
+            return None
+        combined = dict(found[0], location=state, days=min(f["days"] for f in found))
+        for name in ("temperature", "rainfall", "rainfall_total", "degree_days"):
+            combined[name] = round(sum(f[name] for f in found) / len(found), 2)
+        combined["temperature_min"] = min(f["temperature_min"] for f in found)
+        combined["temperature_max"] = max(f["temperature_max"] for f in found)
+        combined["last_date"] = min(f["last_date"] for f in found)
+        return combined
+
+    def flush(self):
+        if self._mapping is not None and not self.readonly:
+            self._mapping.flush()
+
+    def close(self):
+        self.flush()
+        self._mapping = self._data = None
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_store(path=STORE_DIR):
+    # One read-only WeatherStore per directory for the whole process, opened on
+    # first use. FileNotFoundError while there is no store yet, and the next
+    # call looks again.
+    with _shared_lock:
+        store = _shared.get(path)
+        if store is None:
+            store = _shared[path] = WeatherStore(path, readonly=True)
+        return store
+
+
+def predict_yield(crop, location, season, year=None, store=None, yield_model=None):
+    # predict_yield with the temperature and rainfall of a stored window; a
+    # trained model is used when given, otherwise the coefficient registry
+    if store is None:
+        store = shared_store()
+    features = store.state_features(location, season, year)
+    if features is None:
+        raise KeyError(f"no weather for {location} ({season})")
+    if yield_model is not None:
+        return yield_model.predict(crop, features["temperature"], features["rainfall"])
+    return model.predict_yield(crop, features["temperature"], features["rainfall"])
+
+
+def read_daily_csv(path):
+    # (location, date, temperature, rainfall) rows from a CSV with a location
+    # (or district, or state) column, date as YYYY-MM-DD, rainfall in mm and
+    # either temperature or tmin and tmax in °C
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            location = row.get("location") or row.get("district") or row.get("state")
+            if row.get("temperature", "") != "":
+                temperature = float(row["temperature"])
+            else:
+                temperature = (float(row["tmin"]) + float(row["tmax"])) / 2
+            yield location, datetime.date.fromisoformat(row["date"]), temperature, float(row["rainfall"] or 0)
+
+
+def make_sample(path, start, days, seed=0):
+    # Synthetic daily weather for every state, drawn around climate_normals.csv:
+    # a month's normal rainfall falls on about a third of its days
+    rng = np.random.default_rng(seed)
+    climates = risk.load_climates()
+    states = sorted({state for state, _ in climates})
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["location", "date", "temperature", "rainfall"])
+        for offset in range(days):
+            day = start + datetime.timedelta(days=offset)
+            windows = season_windows(day)
+            for state in states:
+                climate = risk.climate_for(climates, state, windows[0][0] if windows else "")
+                temperature = rng.normal(climate.temperature_mean, climate.temperature_std)
+                wet = rng.random() < 1 / 3
+                rainfall = rng.exponential(climate.rainfall_mean / RAINFALL_PERIOD_DAYS * 3) if wet else 0.0
+                writer.writerow([state, day.isoformat(), round(temperature, 1), round(rainfall, 1)])
+
+
+def print_windows(store, location):
+    print(f"{'season':<8} {'year':>5} {'days':>5} {'to':>10} {'temp':>6} {'rain/mo':>8} {'rain':>8} {'GDD':>8}")
+    for season, year in store.windows(location):
+        f = store.features(location, season, year)
+        if f:
+            print(f"{season:<8} {year:>5} {f['days']:>5} {f['last_date'].isoformat():>10} {f['temperature']:>6.1f} "
+                  f"{f['rainfall']:>8.1f} {f['rainfall_total']:>8.1f} {f['degree_days']:>8.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Daily weather feature store for the yield model")
+    parser.add_argument("csv", nargs="?", help="daily weather to ingest: location,date,temperature,rainfall")
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--base-temperature", type=float, default=10.0, help="degree-day base for a new store")
+    parser.add_argument("--show", metavar="LOCATION", help="print the stored windows of a state or district")
+    parser.add_argument("--make-sample", action="store_true", help="write synthetic daily weather to csv instead")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, default=datetime.date(2024, 1, 1))
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.make_sample:
+        if not args.csv:
+            parser.error("--make-sample needs a csv path")
+        make_sample(args.csv, args.start, args.days, args.seed)
+        print(f"wrote {args.days:,} days of synthetic weather to {args.csv}")
+        return 0
+    if args.show:
+        with WeatherStore(args.store, readonly=True) as store:
+            print_windows(store, args.show)
+        return 0
+    if not args.csv:
+        parser.error("give a csv to ingest, --show or --make-sample")
+    with WeatherStore(args.store, args.base_temperature) as store:
+        start = time.perf_counter()
+        days = 0
+        updated = 0
+        for day in read_daily_csv(args.csv):
+            updated += store.append(*day)
+            days += 1
+        elapsed = time.perf_counter() - start
+    print(f"ingested {days:,} days ({updated:,} window updates) in {elapsed:.2f} s ({days / elapsed:,.0f} days/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())